@@ -1,15 +1,22 @@
+import os
+
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LawConnect.settings')
+# Set up Django before the consumers import any models.
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from django.urls import path
 from . import consumers
-import os
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LawConnect.settings')
+
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
+    "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
         URLRouter([
             path('ws/chat/<int:room_name>/', consumers.ChatConsumer.as_asgi()),
+            path('ws/notifications/', consumers.NotificationConsumer.as_asgi()),
         ])
     ),
-})
\ No newline at end of file
+})
@@ -1,61 +1,137 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from ..apps.users.models import User
-from ..apps.cases.models import Message
-from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from apps.users.models import User
+from apps.cases.models import Case, Message, Thread
+from apps.notifications.dispatch import notification_group
+from apps.notifications.models import Notification
+from apps.notifications.serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBuffer:
+    """Write-behind buffer for chat messages.
+
+    Consumers hand over unsaved ``Message`` instances and broadcast straight
+    away; the buffer persists them with one ``bulk_create`` once ``max_size``
+    messages are waiting or ``max_delay`` seconds have passed, whichever comes
+    first. A failed batch is retried on the next flush, up to ``max_attempts``.
+    """
+
+    def __init__(self, max_size, max_delay, max_attempts=3):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.pending = []
+        self._timer = None
+
+    def add(self, message):
+        self.pending.append((message, 0))
+        if len(self.pending) >= self.max_size:
+            asyncio.ensure_future(self.flush())
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_later)
+
+    def _flush_later(self):
+        self._timer = None
+        asyncio.ensure_future(self.flush())
+
+    async def flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        try:
+            await database_sync_to_async(Message.objects.bulk_create)([message for message, _ in batch])
+        except DatabaseError:
+            logger.exception("Failed to persist %d chat messages", len(batch))
+            retry = [(message, attempts + 1) for message, attempts in batch if attempts + 1 < self.max_attempts]
+            self.pending = retry + self.pending
+            if self.pending and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.max_delay, self._flush_later)
+
+
+message_buffer = MessageWriteBuffer(
+    max_size=getattr(settings, 'CHAT_WRITE_BUFFER_SIZE', 100),
+    max_delay=getattr(settings, 'CHAT_WRITE_BUFFER_DELAY', 0.25),
+)
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
         self.room_name = self.scope['url_route']['kwargs']['room_name']  # this is now a user ID
-        user1_id = self.scope['user'].id
-        user2_id = self.room_name
+        # Receiver, case and thread are looked up once here, not per message.
+        self.receiver = await self.get_receiver_user()
+        if self.receiver is None:
+            await self.close()
+            return
+        self.conversations = {}
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        self.default_case_id = query.get('case_id', [None])[0]
+        if self.default_case_id and await self.get_conversation(self.default_case_id) is None:
+            await self.close()
+            return
 
         # Use sorted IDs to create a consistent room group name
-        self.room_group_name = f"chat_{'_'.join(sorted([str(user1_id), str(user2_id)]))}"
+        self.room_group_name = f"chat_{'_'.join(sorted([str(self.user.id), str(self.room_name)]))}"
 
         await self.channel_layer.group_add(self.room_group_name, self.channel_name)
         await self.accept()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        if hasattr(self, 'room_group_name'):
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+            await message_buffer.flush()
 
     async def receive(self, text_data):
         data = json.loads(text_data)
         message = data.get('message')
-        case_id = data.get('case_id')
+        case_id = data.get('case_id') or self.default_case_id
 
         # Validate message and case_id
         if not message:
             await self.send(text_data=json.dumps({'error': 'Message content is missing'}))
             return
-        
+
         if not case_id:
             await self.send(text_data=json.dumps({'error': 'Missing case_id'}))
             return
 
-        sender = self.scope['user']
-        receiver = await self.get_receiver_user()
-
-        if not receiver:
-            await self.send(text_data=json.dumps({'error': 'Receiver not found'}))
-            return
-
-        try:
-            # Save the message in the database
-            await self.save_message(sender, receiver, message, case_id)
-        except Case.DoesNotExist:
+        conversation = await self.get_conversation(case_id)
+        if conversation is None:
             await self.send(text_data=json.dumps({'error': 'Case not found'}))
             return
+        case, thread = conversation
+
+        message_buffer.add(Message(
+            thread=thread, case=case, content=message, sender=self.user, receiver=self.receiver,
+        ))
 
         # Send message to group
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 'type': 'chat_message',
-                'sender': sender.username,
-                'receiver': receiver.username,
-                'message': message
+                'sender': self.user.username,
+                'receiver': self.receiver.username,
+                'message': message,
+                'case_id': case.id,
+                'thread_id': thread.id,
             }
         )
 
@@ -63,21 +139,78 @@ class ChatConsumer(AsyncWebsocketConsumer):
         await self.send(text_data=json.dumps({
             'sender': event['sender'],
             'receiver': event['receiver'],
-            'message': event['message']
+            'message': event['message'],
+            'case_id': event['case_id'],
+            'thread_id': event['thread_id'],
         }))
 
-    @sync_to_async
+    async def get_conversation(self, case_id):
+        """Return the cached ``(case, thread)`` for ``case_id``, resolving it on first use."""
+        key = str(case_id)
+        if key not in self.conversations:
+            self.conversations[key] = await self.resolve_conversation(key)
+        return self.conversations[key]
+
+    @database_sync_to_async
     def get_receiver_user(self):
         try:
             return User.objects.get(id=int(self.room_name))
-        except User.DoesNotExist:
+        except (User.DoesNotExist, ValueError):
             return None
 
-    @sync_to_async
-    def save_message(self, sender, receiver, message, case_id):
-        from apps.cases.models import Case  # avoid circular import
+    @database_sync_to_async
+    def resolve_conversation(self, case_id):
+        """Return ``(case, thread)`` if the two ends are the case's client and lawyer."""
         try:
-            case = Case.objects.get(id=case_id)
-            Message.objects.create(sender=sender, receiver=receiver, content=message, case=case)
-        except Case.DoesNotExist:
-            raise Case.DoesNotExist
+            case = Case.objects.get(id=int(case_id))
+        except (Case.DoesNotExist, ValueError):
+            return None
+        if {case.client_id, case.lawyer_id} != {self.user.id, self.receiver.id}:
+            return None
+        thread, _ = Thread.get_or_create_thread(self.user, self.receiver, case)
+        return case, thread
+
+
+class NotificationConsumer(AsyncWebsocketConsumer):
+    """Pushes a user's new notifications as they are written.
+
+    Connect with ``?since=<id>`` to first receive everything newer than the
+    last notification the client saw, oldest first. Both the catch-up and
+    live pushes arrive as ``{"type": "notifications", "notifications": [...]}``;
+    the catch-up also carries ``has_more`` when it was cut off at
+    ``CATCH_UP_LIMIT`` rows, in which case the client pages the rest over REST.
+    """
+    CATCH_UP_LIMIT = 200
+
+    async def connect(self):
+        self.user = self.scope['user']
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = notification_group(self.user.id)
+        # Join before catching up so nothing written in between is missed.
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        self.caught_up = set()
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query.get('since', [None])[0]
+        if since is not None and since.isdigit():
+            rows, has_more = await self.get_missed(int(since))
+            self.caught_up = {row['id'] for row in rows}
+            await self.send(text_data=json.dumps({'type': 'notifications', 'notifications': rows, 'has_more': has_more}))
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def notifications_created(self, event):
+        rows = [row for row in event['notifications'] if row['id'] not in self.caught_up]
+        if rows:
+            await self.send(text_data=json.dumps({'type': 'notifications', 'notifications': rows}))
+
+    @database_sync_to_async
+    def get_missed(self, since):
+        missed = list(Notification.objects.filter(user=self.user, id__gt=since).order_by('id')[:self.CATCH_UP_LIMIT + 1])
+        return NotificationSerializer(missed[:self.CATCH_UP_LIMIT], many=True).data, len(missed) > self.CATCH_UP_LIMIT
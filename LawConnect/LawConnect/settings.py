@@ -41,6 +41,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework_simplejwt',
+    'rest_framework_simplejwt.token_blacklist',
      'apps.users',
      'channels',
      'apps.cases',
@@ -52,7 +53,7 @@ INSTALLED_APPS = [
     ]
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
         #'rest_framework.authentication.TokenAuthentication',
         #'rest_framework.authentication.SessionAuthentication',
     ),
@@ -74,7 +75,13 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    'TOKEN_REFRESH_SERIALIZER': 'apps.users.blacklist.IndexedTokenRefreshSerializer',
 }
+# Refresh tokens are checked against an in-process bloom filter that is
+# rebuilt from the blacklist table this often (see apps.users.blacklist).
+TOKEN_BLACKLIST_REBUILD_INTERVAL = 3600
+# Expired outstanding/blacklisted tokens removed per transaction by prune_tokens.
+TOKEN_PRUNE_BATCH_SIZE = 1000
 CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:5173",
     "http://localhost:5173",
@@ -129,6 +136,38 @@ CHANNEL_LAYERS = {
         },
     },
 }
+# 'async' queues notifications for a background thread that writes them in
+# batches after the request's transaction commits; 'sync' inserts them inline.
+NOTIFICATION_DELIVERY = os.environ.get('NOTIFICATION_DELIVERY', 'async')
+NOTIFICATION_BATCH_SIZE = 200
+NOTIFICATION_BATCH_WAIT = 0.5
+# Read notifications older than this are moved to the archive table by the
+# archive_notifications command, in batches of NOTIFICATION_ARCHIVE_BATCH_SIZE.
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000
+# Chat messages are persisted in batches of up to this many, or after this
+# many seconds, whichever comes first (see LawConnect.consumers).
+CHAT_WRITE_BUFFER_SIZE = 100
+CHAT_WRITE_BUFFER_DELAY = 0.25
+
+# Cache: set CACHE_URL (e.g. redis://127.0.0.1:6379/1) so every worker
+# shares cached pages and version stamps; the local-memory fallback is per
+# process and only suitable for development.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['CACHE_URL'],
+    } if os.environ.get('CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+LAWYER_DIRECTORY_CACHE_TIMEOUT = 300
+# Per-user /law/dashboard/ summaries; signals drop them early on changes.
+DASHBOARD_CACHE_TIMEOUT = 60
+DASHBOARD_UPCOMING_LIMIT = 5
+# Authenticated users are served from the cache for up to this many seconds;
+# saves, deletes and logouts drop the entry straight away.
+USER_CACHE_TIMEOUT = 300
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -137,6 +176,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than shared-cache memory, so concurrent test threads
+        # wait on SQLite's busy timeout instead of failing on table locks.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -178,6 +220,30 @@ USE_TZ = True
 STATIC_URL = 'static/'
 MEDIA_ROOT = os.path.join(BASE_DIR,'media')
 MEDIA_URL = '/media/'
+# Set to 'x-accel' (nginx) or 'x-sendfile' to let the front proxy stream
+# document downloads after Django has checked permissions; see deploy/nginx.conf.
+DOCUMENT_DOWNLOAD_OFFLOAD = os.environ.get('DOCUMENT_DOWNLOAD_OFFLOAD') or None
+DOCUMENT_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+# Longest bookable appointment; also bounds the overlap range scans in
+# apps.cases.availability. Availability can be asked for this far at once.
+APPOINTMENT_MAX_DURATION = timedelta(hours=8)
+AVAILABILITY_MAX_RANGE = timedelta(days=31)
+# New invoices fall due this many days after they are raised; the
+# sweep_overdue_invoices command marks late ones overdue in batches.
+INVOICE_PAYMENT_TERMS_DAYS = 30
+INVOICE_OVERDUE_BATCH_SIZE = 500
+# Rows per transaction for bulk invoice imports (apps.cases.invoice_io).
+INVOICE_IMPORT_CHUNK_SIZE = 1000
+# Resumable uploads: fixed chunk size, where partial files live (outside
+# MEDIA_ROOT so they are never served), and how long an idle session is kept.
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+UPLOAD_SESSION_TTL = timedelta(hours=24)
+# Hash and sniff uploads as they stream in (see apps.cases.uploadhandlers).
+FILE_UPLOAD_HANDLERS = [
+    'apps.cases.uploadhandlers.DigestMemoryFileUploadHandler',
+    'apps.cases.uploadhandlers.DigestTemporaryFileUploadHandler',
+]
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Case, CaseUpdate, Appointment, Document, Message, Invoice
+from .models import Case, CaseUpdate, Appointment, Document, Message, Invoice, InvoiceRollup
 
 admin.site.register(Case)
 admin.site.register(CaseUpdate)
@@ -7,3 +7,4 @@ admin.site.register(Appointment)
 admin.site.register(Document)
 admin.site.register(Message)
 admin.site.register(Invoice)
+admin.site.register(InvoiceRollup)
@@ -0,0 +1,75 @@
+"""Lawyer availability and double-booking checks.
+
+Every query here is a range scan on ``appointment_lawyer_start_idx``. An
+appointment overlaps ``[start, end)`` when it starts before ``end`` and ends
+after ``start``; since no appointment is longer than
+``APPOINTMENT_MAX_DURATION``, only those starting after
+``start - APPOINTMENT_MAX_DURATION`` can qualify, which bounds the scan on
+both sides.
+"""
+from django.conf import settings
+from django.db.models import F
+
+from .models import Appointment, BookingLock
+
+# Cancelled appointments free their slot.
+NON_BLOCKING_STATUSES = ('cancelled',)
+
+
+def overlapping(lawyer_id, start, end):
+    return (Appointment.objects
+            .filter(lawyer_id=lawyer_id,
+                    start_time__gt=start - settings.APPOINTMENT_MAX_DURATION,
+                    start_time__lt=end,
+                    end_time__gt=start)
+            .exclude(status__in=NON_BLOCKING_STATUSES))
+
+
+def lock_calendar(lawyer_id):
+    """Serialise bookings for ``lawyer_id`` until the current transaction ends.
+
+    Must be the first statement of the transaction: it is a write, so the
+    lock is held before the overlap check reads.
+    """
+    if not BookingLock.objects.filter(lawyer_id=lawyer_id).update(bookings=F('bookings') + 1):
+        BookingLock.objects.bulk_create([BookingLock(lawyer_id=lawyer_id, bookings=1)], ignore_conflicts=True)
+        BookingLock.objects.filter(lawyer_id=lawyer_id).update(bookings=F('bookings') + 1)
+
+
+def has_conflict(lawyer_id, start, end, exclude_pk=None):
+    appointments = overlapping(lawyer_id, start, end)
+    if exclude_pk is not None:
+        appointments = appointments.exclude(pk=exclude_pk)
+    return appointments.exists()
+
+
+def merge_intervals(intervals):
+    """Collapse sorted ``(start, end)`` pairs into disjoint busy blocks."""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [tuple(block) for block in merged]
+
+
+def busy_blocks(lawyer_id, start, end):
+    rows = overlapping(lawyer_id, start, end).order_by('start_time').values_list('start_time', 'end_time')
+    return [(max(block_start, start), min(block_end, end)) for block_start, block_end in merge_intervals(rows)]
+
+
+def free_slots(lawyer_id, start, end, min_length=None):
+    """Return the gaps in ``[start, end)`` not covered by the lawyer's appointments."""
+    slots = []
+    cursor = start
+    for block_start, block_end in busy_blocks(lawyer_id, start, end):
+        if block_start > cursor:
+            slots.append((cursor, block_start))
+        cursor = max(cursor, block_end)
+    if cursor < end:
+        slots.append((cursor, end))
+    if min_length:
+        slots = [(slot_start, slot_end) for slot_start, slot_end in slots if slot_end - slot_start >= min_length]
+    return slots
@@ -0,0 +1,12 @@
+from django.core.cache import cache
+
+
+def dashboard_cache_key(user_id):
+    return f'dashboard:{user_id}'
+
+
+def invalidate_dashboards(*user_ids):
+    """Drop the cached dashboards of ``user_ids``; ``None`` entries are ignored."""
+    keys = {dashboard_cache_key(user_id) for user_id in user_ids if user_id is not None}
+    if keys:
+        cache.delete_many(keys)
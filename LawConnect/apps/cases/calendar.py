@@ -0,0 +1,122 @@
+"""iCalendar feeds of a user's appointments.
+
+Feed URLs carry a signed user id instead of a session so calendar apps can
+subscribe without logging in. The user's ``feed_token_version`` is signed in
+with it, so rotating the version revokes every URL issued before. The body is
+generated row by row from an ``iterator()`` and streamed; its ETag is derived
+from an aggregate over the same rows, which only match while the token is
+current, so a poll of an unchanged feed is answered with one query and a 304.
+"""
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db.models import Count, Exists, F, Max, Q
+from django.utils import timezone
+
+from .models import Appointment
+
+User = get_user_model()
+
+FEED_SALT = 'apps.cases.calendar.feed'
+# Older appointments are left out of the feed.
+FEED_HISTORY = timedelta(days=180)
+ITERATOR_CHUNK_SIZE = 500
+
+ICS_STATUS = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def feed_token(user):
+    return signing.Signer(salt=FEED_SALT).sign(f'{user.pk}:{user.feed_token_version}')
+
+
+def rotate_feed_token(user):
+    """Revoke the user's feed URLs and return a token for a new one."""
+    User.objects.filter(pk=user.pk).update(feed_token_version=F('feed_token_version') + 1)
+    user.refresh_from_db(fields=['feed_token_version'])
+    return feed_token(user)
+
+
+def read_feed_token(token):
+    """Return ``(user_id, version)`` from ``token``, or ``None`` if it was tampered with."""
+    try:
+        user_id, _, version = signing.Signer(salt=FEED_SALT).unsign(token).partition(':')
+        # Tokens from before versioning carry the id alone.
+        return int(user_id), int(version or 0)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def feed_token_is_current(user_id, version):
+    return User.objects.filter(pk=user_id, feed_token_version=version).exists()
+
+
+def feed_queryset(user_id, version):
+    """The user's appointments, or none at all once ``version`` has been rotated away."""
+    since = timezone.now() - FEED_HISTORY
+    current = User.objects.filter(pk=user_id, feed_token_version=version)
+    return Appointment.objects.filter(Q(lawyer_id=user_id) | Q(client_id=user_id), Exists(current),
+                                      start_time__gte=since)
+
+
+def feed_state(appointments):
+    return appointments.aggregate(count=Count('id'), changed=Max('updated_at'), last=Max('id'))
+
+
+def feed_etag(state):
+    changed = state['changed'].timestamp() if state['changed'] else 0
+    return f'"{state["count"]}-{changed:.6f}-{state["last"] or 0}"'
+
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Split ``line`` into 75-octet pieces as RFC 5545 requires."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    pieces, limit = [], 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Never split inside a multi-byte character.
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode())
+        encoded = encoded[cut:]
+        limit = 74
+    return '\r\n '.join(pieces) + '\r\n'
+
+
+def ics_time(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def iter_calendar(appointments, host):
+    yield fold('BEGIN:VCALENDAR')
+    yield fold('VERSION:2.0')
+    yield fold('PRODID:-//LawConnect//Appointments//EN')
+    yield fold('CALSCALE:GREGORIAN')
+    rows = (appointments.order_by('start_time', 'id')
+            .values_list('id', 'title', 'start_time', 'end_time', 'status', 'updated_at')
+            .iterator(chunk_size=ITERATOR_CHUNK_SIZE))
+    for pk, title, start, end, status, updated in rows:
+        yield ''.join((
+            fold('BEGIN:VEVENT'),
+            fold(f'UID:appointment-{pk}@{host}'),
+            fold(f'DTSTAMP:{ics_time(updated)}'),
+            fold(f'LAST-MODIFIED:{ics_time(updated)}'),
+            fold(f'DTSTART:{ics_time(start)}'),
+            fold(f'DTEND:{ics_time(end)}'),
+            fold(f'SUMMARY:{escape(title)}'),
+            fold(f'STATUS:{ICS_STATUS.get(status, "TENTATIVE")}'),
+            fold('END:VEVENT'),
+        ))
+    yield fold('END:VCALENDAR')
@@ -0,0 +1,71 @@
+"""Per-user landing-page summary.
+
+``build_dashboard`` answers everything the landing page shows with five
+aggregate queries. Results are cached per user for
+``DASHBOARD_CACHE_TIMEOUT`` seconds and dropped early by the signals in
+``apps.cases.signals`` whenever one of the user's cases, requests,
+appointments or invoices changes.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .availability import NON_BLOCKING_STATUSES
+from .cache import dashboard_cache_key
+from .models import Appointment, Case, CaseRequest, InvoiceRollup
+
+OUTSTANDING_STATUSES = ('pending', 'overdue')
+
+
+def involving(user):
+    return Q(client=user) | Q(lawyer=user)
+
+
+def build_dashboard(user):
+    now = timezone.now()
+
+    cases = dict.fromkeys((value for value, _ in Case.STATUS_CHOICES), 0)
+    cases.update(Case.objects.filter(involving(user)).values_list('status').annotate(count=Count('id')).order_by())
+
+    requests = CaseRequest.objects.filter(involving(user), status='pending').aggregate(
+        received=Count('id', filter=Q(lawyer=user)), sent=Count('id', filter=Q(client=user)))
+
+    upcoming = Appointment.objects.filter(involving(user), start_time__gte=now).exclude(status__in=NON_BLOCKING_STATUSES)
+    upcoming_count = upcoming.count()
+    next_appointments = list(upcoming.order_by('start_time', 'id').values(
+        'id', 'title', 'start_time', 'end_time', 'status', 'case_id', 'client_id', 'lawyer_id',
+    )[:settings.DASHBOARD_UPCOMING_LIMIT])
+
+    invoices = {}
+    totals = InvoiceRollup.objects.filter(involving(user), status__in=OUTSTANDING_STATUSES).aggregate(**{
+        f'{side}_{status}_{measure}': Sum(field, filter=Q(**{side_field: user}, status=status))
+        for side, side_field in (('payable', 'client'), ('receivable', 'lawyer'))
+        for status in OUTSTANDING_STATUSES
+        for measure, field in (('count', 'count'), ('amount', 'total'))
+    })
+    for side in ('payable', 'receivable'):
+        invoices[side] = {
+            status: {'count': totals[f'{side}_{status}_count'] or 0,
+                     'amount': totals[f'{side}_{status}_amount'] or Decimal('0')}
+            for status in OUTSTANDING_STATUSES
+        }
+
+    return {
+        'cases': cases,
+        'case_requests': {'pending_received': requests['received'], 'pending_sent': requests['sent']},
+        'appointments': {'upcoming_count': upcoming_count, 'next': next_appointments},
+        'invoices': invoices,
+        'generated_at': now,
+    }
+
+
+def get_dashboard(user):
+    key = dashboard_cache_key(user.pk)
+    dashboard = cache.get(key)
+    if dashboard is None:
+        dashboard = build_dashboard(user)
+        cache.set(key, dashboard, settings.DASHBOARD_CACHE_TIMEOUT)
+    return dashboard
@@ -0,0 +1,120 @@
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """Return ``(start, end)`` for a single-range ``Range`` header.
+
+    ``None`` means the header should be ignored and the whole file served;
+    ``False`` means the range cannot be satisfied.
+    """
+    if not header:
+        return None
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if not match:
+        # Multiple ranges or other units: serving the full body is allowed.
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, min(end, size - 1)
+
+
+def iter_range(fh, start, length):
+    try:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        fh.close()
+
+
+def serve_document(request, document):
+    """Serve ``document`` with conditional GET and byte-range support.
+
+    The caller is expected to have already checked that ``request.user`` may
+    read the document. With ``DOCUMENT_DOWNLOAD_OFFLOAD`` set the transfer is
+    handed to the front proxy instead of streaming through the worker.
+    """
+    etag = f'"{document.sha256}"' if document.sha256 else None
+    last_modified = int(document.uploaded_at.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        offload = getattr(settings, 'DOCUMENT_DOWNLOAD_OFFLOAD', None)
+        if offload:
+            response = offload_response(document, offload)
+        else:
+            response = stream_response(request, document, etag, last_modified)
+
+    if etag:
+        response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def stream_response(request, document, etag, last_modified):
+    size = document.file_size
+    filename = os.path.basename(document.file.name)
+    content_type = document.mime_type or 'application/octet-stream'
+
+    byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if byte_range is not None and if_range and if_range not in (etag, http_date(last_modified)):
+        byte_range = None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+    elif byte_range is None:
+        response = FileResponse(document.file.open('rb'), as_attachment=True,
+                                filename=filename, content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(iter_range(document.file.open('rb'), start, length),
+                                         status=206, content_type=content_type)
+        response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response.headers['Content-Length'] = str(length)
+        response.headers['Content-Disposition'] = content_disposition_header(True, filename)
+
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def offload_response(document, mode):
+    """Let nginx (``x-accel``) or Apache/lighttpd (``x-sendfile``) send the bytes."""
+    response = HttpResponse(content_type=document.mime_type or 'application/octet-stream')
+    response.headers['Content-Disposition'] = content_disposition_header(True, os.path.basename(document.file.name))
+    if mode == 'x-accel':
+        prefix = getattr(settings, 'DOCUMENT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+        response.headers['X-Accel-Redirect'] = prefix + quote(document.file.name)
+    elif mode == 'x-sendfile':
+        response.headers['X-Sendfile'] = document.file.path
+    else:
+        raise ValueError(f"Unknown DOCUMENT_DOWNLOAD_OFFLOAD mode: {mode!r}")
+    return response
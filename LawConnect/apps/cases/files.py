@@ -0,0 +1,87 @@
+import hashlib
+import mimetypes
+
+# Enough leading bytes to recognise every signature below.
+SNIFF_BYTES = 32
+
+OOXML_TYPES = {
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.pptx': 'application/vnd.openxmlformats-officedocument.presentationml.presentation',
+}
+OLE_TYPES = {
+    '.doc': 'application/msword',
+    '.xls': 'application/vnd.ms-excel',
+    '.ppt': 'application/vnd.ms-powerpoint',
+    '.msg': 'application/vnd.ms-outlook',
+}
+
+SIGNATURES = [
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'{\\rtf', 'application/rtf'),
+    (b'\x1f\x8b', 'application/gzip'),
+    (b'ID3', 'audio/mpeg'),
+]
+
+
+def _extension(name):
+    name = (name or '').lower()
+    dot = name.rfind('.')
+    return name[dot:] if dot != -1 else ''
+
+
+def sniff_content_type(head, name=None):
+    """Return the MIME type for a file from its leading bytes.
+
+    The file name is only used to tell apart container formats that share a
+    signature (zip-based Office files, OLE compound documents) and as a last
+    resort when the bytes are not recognised.
+    """
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        return 'video/mp4'
+    if head.startswith(b'PK\x03\x04'):
+        return OOXML_TYPES.get(_extension(name), 'application/zip')
+    if head.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'):
+        return OLE_TYPES.get(_extension(name), 'application/x-ole-storage')
+
+    guessed = mimetypes.guess_type(name or '')[0]
+    if guessed:
+        return guessed
+    if not head or b'\x00' in head:
+        return 'application/octet-stream'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as exc:
+        # Tolerate a multi-byte character cut off at the sniff boundary.
+        if exc.start < len(head) - 3:
+            return 'application/octet-stream'
+    return 'text/plain'
+
+
+def scan_file(fileobj, name=None):
+    """Read ``fileobj`` once and return ``(size, sha256, content_type)``."""
+    digest = hashlib.sha256()
+    head = b''
+    size = 0
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    chunks = fileobj.chunks() if hasattr(fileobj, 'chunks') else iter(lambda: fileobj.read(64 * 1024), b'')
+    for chunk in chunks:
+        digest.update(chunk)
+        size += len(chunk)
+        if len(head) < SNIFF_BYTES:
+            head += chunk[:SNIFF_BYTES - len(head)]
+    if hasattr(fileobj, 'seek'):
+        fileobj.seek(0)
+    return size, digest.hexdigest(), sniff_content_type(head, name)
@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+class ListFilterBackend(BaseFilterBackend):
+    """Translate the shared list query params into SQL filters.
+
+    ``?status=``, ``?type=``, ``?content_type=``, ``?lawyer=`` and
+    ``?client=`` are applied when the model has that field, as are
+    ``?min_size=`` / ``?max_size=`` on models with a ``size`` column.
+    ``?created_after=`` / ``?created_before=`` bound the view's
+    ``date_field`` (``created_at`` by default) and accept either a date or
+    an ISO datetime.
+    """
+    choice_params = ('status', 'type', 'content_type')
+    user_params = ('lawyer', 'client')
+
+    def filter_queryset(self, request, queryset, view):
+        params = request.query_params
+        model = queryset.model
+
+        for name in self.choice_params:
+            value = params.get(name)
+            if value and self._has_field(model, name):
+                queryset = queryset.filter(**{name: value})
+
+        for name in self.user_params:
+            value = params.get(name)
+            if value and self._has_field(model, name):
+                if not value.isdigit():
+                    raise ValidationError({name: 'Must be a user id.'})
+                queryset = queryset.filter(**{f'{name}_id': int(value)})
+
+        if self._has_field(model, 'size'):
+            for name, lookup in (('min_size', 'size__gte'), ('max_size', 'size__lte')):
+                value = params.get(name)
+                if value:
+                    if not value.isdigit():
+                        raise ValidationError({name: 'Must be a number of bytes.'})
+                    queryset = queryset.filter(**{lookup: int(value)})
+
+        date_field = getattr(view, 'date_field', 'created_at')
+        if self._has_field(model, date_field):
+            after = self._parse(params, 'created_after')
+            before = self._parse(params, 'created_before')
+            if after is not None:
+                queryset = queryset.filter(**{f'{date_field}__gte': after})
+            if before is not None:
+                queryset = queryset.filter(**{f'{date_field}__lt': before})
+
+        return queryset
+
+    @staticmethod
+    def _has_field(model, name):
+        try:
+            model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    @staticmethod
+    def _parse(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            parsed = parse_datetime(value)
+            day = parse_date(value) if parsed is None else None
+        except ValueError:
+            parsed = day = None
+        if parsed is None:
+            if day is None:
+                raise ValidationError({name: 'Must be a date or ISO datetime.'})
+            parsed = datetime(day.year, day.month, day.day)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
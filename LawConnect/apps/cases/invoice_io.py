@@ -0,0 +1,218 @@
+"""Bulk invoice import and export.
+
+Imports read CSV or NDJSON records lazily and work through them in chunks.
+Each chunk costs a fixed handful of queries no matter how many rows it
+holds: one to load the referenced cases, one for the lawyers' profiles, one
+``bulk_create``, the rollup updates and one batch of notifications.
+Exports stream rows straight from a database iterator.
+
+Records that carry an ``id`` keep it, along with their ``created_at``, and
+are skipped if that invoice already exists, so re-importing an export is a
+no-op rather than a second copy.
+"""
+import codecs
+import csv
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_date, parse_datetime
+
+from apps.notifications.signals import create_notifications, notification_payload
+from apps.users.models import LawyerProfile
+from .cache import invalidate_dashboards
+from .models import Case, Invoice
+from .rollups import add_invoices
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson'}
+# Exported column names match what the importer reads, so files round-trip.
+EXPORT_COLUMNS = ('id', 'case', 'client', 'lawyer', 'amount', 'status', 'created_at', 'due_date', 'paid_at', 'description')
+EXPORT_FIELDS = ('id', 'case_id', 'client_id', 'lawyer_id', 'amount', 'status', 'created_at', 'due_date', 'paid_at',
+                 'description')
+STATUSES = {value for value, _ in Invoice.STATUS_CHOICES}
+# Enough to explain what went wrong without echoing a whole bad file back.
+MAX_REPORTED_ERRORS = 100
+
+
+def read_records(lines, fmt):
+    """Yield one dict per record from an iterable of byte or text lines."""
+    lines = iter(lines)
+    first = next(lines, None)
+    if first is None:
+        return
+    if isinstance(first, bytes):
+        lines = codecs.iterdecode((line for chain in ([first], lines) for line in chain), 'utf-8-sig')
+    else:
+        lines = (line for chain in ([first.lstrip('\ufeff')], lines) for line in chain)
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if line.strip():
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield record if isinstance(record, dict) else {'__invalid__': line}
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_id(value):
+    value = str(value).strip() if value is not None else ''
+    return int(value) if value.isdigit() else None
+
+
+class InvoiceImporter:
+    def __init__(self, chunk_size=1000, notify=True):
+        self.chunk_size = chunk_size
+        self.notify = notify
+        self.created = 0
+        self.skipped = 0
+        self.error_count = 0
+        self.errors = []
+
+    def run(self, records):
+        seen = 0
+        for chunk in chunked(records, self.chunk_size):
+            self.import_chunk(chunk, first_row=seen + 1)
+            seen += len(chunk)
+        return self.report()
+
+    def report(self):
+        return {'created': self.created, 'skipped': self.skipped, 'error_count': self.error_count, 'errors': self.errors}
+
+    def import_chunk(self, records, first_row=1):
+        case_ids = {parse_id(record.get('case')) for record in records} - {None}
+        cases = {row['id']: row for row in Case.objects.filter(id__in=case_ids).values('id', 'client_id', 'lawyer_id')}
+        lawyer_ids = {parse_id(record.get('lawyer')) for record in records} | {case['lawyer_id'] for case in cases.values()}
+        charges = dict(LawyerProfile.objects.filter(user_id__in=lawyer_ids - {None}).values_list('user_id', 'per_case_charge'))
+        invoice_ids = {parse_id(record.get('id')) for record in records} - {None}
+        # Ids already in the table, or earlier in this chunk, are skipped.
+        taken = set(Invoice.objects.filter(id__in=invoice_ids).values_list('id', flat=True)) if invoice_ids else set()
+
+        invoices, created_at = [], {}
+        for offset, record in enumerate(records):
+            invoice_id = parse_id(record.get('id'))
+            if invoice_id in taken:
+                self.skipped += 1
+                continue
+            invoice, errors = self.build(record, cases, charges)
+            if errors:
+                self.error(first_row + offset, errors)
+                continue
+            if invoice_id is not None:
+                invoice.id = invoice_id
+                taken.add(invoice_id)
+            if record.get('created_at'):
+                created_at[len(invoices)] = parse_datetime(str(record['created_at']))
+            invoices.append(invoice)
+        if not invoices:
+            return
+
+        explicit_ids = any(invoice.id is not None for invoice in invoices)
+        with transaction.atomic():
+            Invoice.objects.bulk_create(invoices)
+            if created_at:
+                # auto_now_add overwrites created_at on insert; put it back.
+                for position, value in created_at.items():
+                    invoices[position].created_at = value
+                Invoice.objects.bulk_update([invoices[position] for position in created_at], ['created_at'])
+            if explicit_ids:
+                # Explicit ids leave PostgreSQL's sequence behind; SQLite needs nothing.
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), [Invoice]):
+                        cursor.execute(sql)
+            add_invoices(invoices)
+            users = {invoice.client_id for invoice in invoices} | {invoice.lawyer_id for invoice in invoices}
+            transaction.on_commit(lambda: invalidate_dashboards(*users))
+            if self.notify:
+                per_lawyer = {}
+                for invoice in invoices:
+                    per_lawyer[invoice.lawyer_id] = per_lawyer.get(invoice.lawyer_id, 0) + 1
+                create_notifications(
+                    notification_payload(lawyer_id, 'invoice', 'Invoices imported', f"{count} invoices were added for you.")
+                    for lawyer_id, count in per_lawyer.items()
+                )
+        self.created += len(invoices)
+
+    def build(self, record, cases, charges):
+        if '__invalid__' in record:
+            return None, {'record': 'Not a JSON object.'}
+        errors = {}
+        case = cases.get(parse_id(record.get('case')))
+        if case is None:
+            errors['case'] = 'Unknown case.'
+        lawyer_id = parse_id(record.get('lawyer')) or (case and case['lawyer_id'])
+        if lawyer_id not in charges:
+            errors['lawyer'] = 'Unknown lawyer.'
+        elif case and lawyer_id != case['lawyer_id']:
+            errors['lawyer'] = 'Does not match the case.'
+        client_id = parse_id(record.get('client')) or (case and case['client_id'])
+        if not client_id:
+            errors['client'] = 'Required.'
+        elif case and client_id != case['client_id']:
+            errors['client'] = 'Does not match the case.'
+        if record.get('created_at') and parse_datetime(str(record['created_at'])) is None:
+            errors['created_at'] = 'Must be an ISO datetime.'
+        try:
+            amount = Decimal(str(record.get('amount', '')).strip())
+            if not amount.is_finite() or amount <= 0 or amount.as_tuple().exponent < -2:
+                raise InvalidOperation
+        except InvalidOperation:
+            errors['amount'] = 'Must be a positive amount with at most two decimals.'
+            amount = None
+        status = (record.get('status') or '').strip()
+        if status and status not in STATUSES:
+            errors['status'] = f"Must be one of {', '.join(sorted(STATUSES))}."
+        paid_at = None
+        if record.get('paid_at'):
+            paid_at = parse_datetime(str(record['paid_at']))
+            if paid_at is None:
+                errors['paid_at'] = 'Must be an ISO datetime.'
+        due_date = None
+        if record.get('due_date'):
+            due_date = parse_date(str(record['due_date']))
+            if due_date is None:
+                errors['due_date'] = 'Must be an ISO date.'
+        if errors:
+            return None, errors
+        if not status:
+            # Same rule as InvoiceViewSet.perform_create.
+            status = 'paid' if amount >= charges[lawyer_id] else 'pending'
+        invoice = Invoice(case_id=case['id'], client_id=client_id, lawyer_id=lawyer_id, amount=amount, status=status,
+                          paid_at=paid_at, description=record.get('description') or None)
+        if due_date is not None:
+            invoice.due_date = due_date
+        return invoice, None
+
+    def error(self, row, errors):
+        """Record a rejected record; ``row`` counts records from 1, not file lines."""
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'errors': errors})
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def iter_export(invoices, fmt, chunk_size=2000):
+    """Yield ``invoices`` as CSV or NDJSON text, one row per chunk of output."""
+    rows = invoices.order_by('id').values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            yield writer.writerow(row)
+        return
+    for row in rows:
+        yield json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=str) + '\n'
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from apps.cases.files import scan_file
+from apps.cases.models import Document
+
+
+class Command(BaseCommand):
+    help = "Fill in size, content type and SHA-256 for documents uploaded before they were stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Document.objects.filter(
+            Q(size__isnull=True) | Q(content_type__isnull=True) | Q(sha256__isnull=True)
+        ).order_by('pk')
+
+        last_pk = 0
+        updated = missing = 0
+        while True:
+            batch = list(pending.filter(pk__gt=last_pk).only('pk', 'file')[:batch_size])
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+
+            filled = []
+            for document in batch:
+                try:
+                    with document.file.open('rb') as fh:
+                        document.size, document.sha256, document.content_type = scan_file(fh, document.file.name)
+                except (FileNotFoundError, ValueError):
+                    missing += 1
+                    continue
+                filled.append(document)
+
+            Document.objects.bulk_update(filled, ['size', 'content_type', 'sha256'])
+            updated += len(filled)
+            self.stdout.write(f"Processed up to document {last_pk} ({updated} updated, {missing} missing files)")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {updated} documents; {missing} had no file in storage."))
@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.cases.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions that have been idle longer than UPLOAD_SESSION_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - settings.UPLOAD_SESSION_TTL
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff).order_by('updated_at')
+
+        removed = 0
+        while True:
+            batch = list(stale[:options['batch_size']])
+            if not batch:
+                break
+            for session in batch:
+                session.discard()
+            removed += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} abandoned upload sessions."))
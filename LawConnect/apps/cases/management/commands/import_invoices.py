@@ -0,0 +1,32 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.cases.invoice_io import FORMATS, InvoiceImporter, read_records
+
+
+class Command(BaseCommand):
+    help = "Bulk-load invoices from a CSV or NDJSON file, one chunk per transaction."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS,
+                            help="Defaults to csv for .csv files and ndjson otherwise.")
+        parser.add_argument('--chunk-size', type=int, default=settings.INVOICE_IMPORT_CHUNK_SIZE)
+        parser.add_argument('--no-notify', action='store_true', help="Do not notify lawyers about imported invoices.")
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].lower().endswith('.csv') else 'ndjson')
+        importer = InvoiceImporter(chunk_size=options['chunk_size'], notify=not options['no_notify'])
+        try:
+            with open(options['path'], 'rb') as fh:
+                report = importer.run(read_records(fh, fmt))
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} invoices; skipped {report['skipped']} existing "
+            f"and {report['error_count']} invalid rows."))
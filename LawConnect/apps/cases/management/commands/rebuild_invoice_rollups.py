@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.cases.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = "Recompute the invoice rollup table from the invoice rows."
+
+    def handle(self, *args, **options):
+        rows = rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} invoice rollup rows."))
@@ -0,0 +1,87 @@
+import hashlib
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.cases.cache import invalidate_dashboards
+from apps.cases.models import Invoice
+from apps.cases.rollups import move_invoices
+from apps.notifications.signals import create_notifications, notification_payload
+
+SWEPT_FIELDS = ('id', 'lawyer_id', 'client_id', 'created_at', 'amount')
+
+
+class Command(BaseCommand):
+    help = ("Mark pending invoices past their due date as overdue, one short transaction per batch, "
+            "notifying the affected clients and lawyers as each batch commits.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.INVOICE_OVERDUE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches; the next run carries on.")
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        late = Invoice.objects.filter(status='pending', due_date__lt=today).order_by('due_date', 'id')
+
+        notified = set()
+        batches = count = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            with transaction.atomic():
+                # The UPDATE comes first so the batch holds the write lock
+                # before it reads anything; overlapping runs queue here
+                # instead of failing to upgrade a read lock.
+                ids = self.flip_batch(late, options['batch_size'])
+                if not ids:
+                    # Nothing is left, or an overlapping run took this batch
+                    # and is sweeping the rest.
+                    break
+                rows = [{**row, 'status': 'pending'}
+                        for row in Invoice.objects.filter(id__in=ids).values(*SWEPT_FIELDS)]
+                move_invoices(rows, 'overdue')
+
+                swept = defaultdict(list)
+                for row in rows:
+                    swept[row['client_id']].append(row['id'])
+                    swept[row['lawyer_id']].append(row['id'])
+                transaction.on_commit(lambda users=list(swept): invalidate_dashboards(*users))
+                # Delivered with this batch rather than at the end of the run,
+                # so a later batch failing does not lose them.
+                create_notifications(self.notification(user_id, invoice_ids) for user_id, invoice_ids in swept.items())
+            notified.update(swept)
+            batches += 1
+            count += len(rows)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Marked {count} invoices overdue in {batches} batches; notified {len(notified)} users."))
+
+    @staticmethod
+    def flip_batch(late, batch_size):
+        """Mark the next ``batch_size`` of ``late`` overdue; return the ids this statement changed."""
+        qn = connection.ops.quote_name
+        batch_sql, params = late.values('id')[:batch_size].query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {qn(Invoice._meta.db_table)} SET {qn('status')} = %s "
+                f"WHERE {qn('status')} = %s AND {qn('id')} IN ({batch_sql}) RETURNING {qn('id')}",
+                ['overdue', 'pending', *params],
+            )
+            return [pk for pk, in cursor.fetchall()]
+
+    @staticmethod
+    def notification(user_id, invoice_ids):
+        invoice_ids = sorted(set(invoice_ids))
+        # The same invoices are only ever reported to a user once.
+        digest = hashlib.sha256(','.join(map(str, invoice_ids)).encode()).hexdigest()[:32]
+        if len(invoice_ids) == 1:
+            content = f"Invoice #{invoice_ids[0]} is now overdue."
+        else:
+            content = f"{len(invoice_ids)} invoices are now overdue."
+        return notification_payload(
+            user_id, 'invoice', 'Invoices overdue', content,
+            related_id=invoice_ids[0] if len(invoice_ids) == 1 else None,
+            dedupe_key=f'overdue:{user_id}:{digest}',
+        )
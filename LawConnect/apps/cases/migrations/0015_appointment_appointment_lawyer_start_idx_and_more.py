@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0014_invoice_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['lawyer', 'start_time'], name='appointment_lawyer_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['lawyer', 'status'], name='case_lawyer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='case',
+            index=models.Index(fields=['-created_at', '-id'], name='case_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['lawyer', '-created_at'], name='caserequest_lawyer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='caserequest',
+            index=models.Index(fields=['client', '-created_at'], name='caserequest_client_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['lawyer', 'status'], name='invoice_lawyer_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_created_idx'),
+        ),
+    ]
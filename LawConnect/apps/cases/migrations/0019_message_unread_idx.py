@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0018_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['thread', 'receiver'], name='message_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:24
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def merge_duplicate_threads(apps, schema_editor):
+    """Key every thread and fold duplicate conversations into the oldest one."""
+    Thread = apps.get_model('cases', 'Thread')
+    Message = apps.get_model('cases', 'Message')
+    Participant = Thread.participants.through
+
+    members = defaultdict(set)
+    for thread_id, user_id in Participant.objects.values_list('thread_id', 'user_id').iterator():
+        members[thread_id].add(user_id)
+
+    keyed = defaultdict(list)
+    for thread_id, case_id in Thread.objects.order_by('id').values_list('id', 'case_id').iterator():
+        if members[thread_id]:
+            key = ':'.join(str(pk) for pk in sorted(members[thread_id]))
+            keyed[(case_id, key)].append(thread_id)
+
+    for (case_id, key), thread_ids in keyed.items():
+        keep, duplicates = thread_ids[0], thread_ids[1:]
+        if duplicates:
+            Message.objects.filter(thread_id__in=duplicates).update(thread_id=keep)
+            Thread.objects.filter(id__in=duplicates).delete()
+        Thread.objects.filter(id=keep).update(participant_key=key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0019_message_unread_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='thread',
+            name='participant_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(merge_duplicate_threads, migrations.RunPython.noop),
+    ]
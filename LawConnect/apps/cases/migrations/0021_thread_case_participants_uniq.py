@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+# Separate from 0020 so the merge's row updates commit before the table is altered.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0020_thread_participant_key'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='thread',
+            constraint=models.UniqueConstraint(fields=('case', 'participant_key'), name='thread_case_participants_uniq'),
+        ),
+    ]
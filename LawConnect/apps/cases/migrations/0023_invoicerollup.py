@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import TruncMonth
+
+
+def build_rollups(apps, schema_editor):
+    Invoice = apps.get_model('cases', 'Invoice')
+    InvoiceRollup = apps.get_model('cases', 'InvoiceRollup')
+    rows = (Invoice.objects
+            .annotate(month=TruncMonth('created_at', output_field=models.DateField()))
+            .values('lawyer_id', 'client_id', 'month', 'status')
+            .annotate(count=models.Count('id'), total=models.Sum('amount'))
+            .order_by())
+    InvoiceRollup.objects.bulk_create((InvoiceRollup(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cases', '0022_appointment_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoiceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('paid', 'Paid'), ('overdue', 'Overdue')], max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('lawyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', 'month'], name='invoice_rollup_client_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='invoicerollup',
+            constraint=models.UniqueConstraint(fields=('lawyer', 'client', 'month', 'status'), name='invoice_rollup_uniq'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
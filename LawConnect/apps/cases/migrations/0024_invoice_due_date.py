@@ -0,0 +1,42 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:34
+
+from datetime import timedelta
+
+import apps.cases.models
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+def backfill_due_dates(apps, schema_editor):
+    # Existing unpaid invoices fall due on the usual terms from when they were raised.
+    Invoice = apps.get_model('cases', 'Invoice')
+    terms = timedelta(days=settings.INVOICE_PAYMENT_TERMS_DAYS)
+    Invoice.objects.filter(due_date__isnull=True).exclude(status='paid').update(
+        due_date=TruncDate(models.ExpressionWrapper(models.F('created_at') + terms, output_field=models.DateTimeField())),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0023_invoicerollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='due_date',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_due_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='invoice',
+            name='due_date',
+            field=models.DateField(blank=True, default=apps.cases.models.default_due_date, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['due_date', 'id'], name='invoice_pending_due_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:55
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_lawyer_search'),
+        ('cases', '0024_invoice_due_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookingLock',
+            fields=[
+                ('lawyer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('bookings', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
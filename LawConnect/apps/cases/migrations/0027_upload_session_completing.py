@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cases', '0026_list_ordering_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadsession',
+            name='completing',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,9 +1,11 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
 
 from apps.users.models import User
+from .cache import invalidate_dashboards
 
 from django.utils import timezone
+from datetime import timedelta
 
 class Case(models.Model):
     STATUS_CHOICES = [
@@ -28,13 +30,35 @@ class Case(models.Model):
         on_delete=models.SET_NULL,
         related_name='accepted_cases'
     )
-    def accept_case(self, lawyer: User):
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lawyer', 'status'], name='case_lawyer_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='case_created_idx'),
+        ]
+
+    @classmethod
+    def claim(cls, case_id, lawyer, accepted_by=None):
+        """Assign case ``case_id`` to ``lawyer`` if it is still open and unassigned.
+
+        The check and the write are one conditional UPDATE, so when several
+        lawyers accept at once exactly one of them gets the case. Returns
+        whether this call won.
+        """
+        lawyer_id = getattr(lawyer, 'pk', lawyer)
+        accepted_by_id = getattr(accepted_by, 'pk', accepted_by) or lawyer_id
+        return bool(cls.objects.filter(pk=case_id, lawyer__isnull=True, status='open').update(
+            lawyer_id=lawyer_id, accepted_by_lawyer_id=accepted_by_id, status='in_review',
+        ))
+
+    def accept_case(self, lawyer, accepted_by=None):
         """Allow a lawyer to accept the case"""
-        if self.status == 'open' and not self.accepted_by_lawyer:
-            self.lawyer = lawyer
-            self.status = 'in_review'  # Status will be updated when accepted
-            self.accepted_by_lawyer = lawyer
-            self.save()
+        claimed = Case.claim(self.pk, lawyer, accepted_by)
+        if claimed:
+            self.refresh_from_db(fields=['lawyer', 'accepted_by_lawyer', 'status'])
+            # claim() is an UPDATE, so no post_save fires.
+            invalidate_dashboards(self.client_id, self.lawyer_id)
+        return claimed
 
     def __str__(self):
         return f'Case: {self.title}, Status: {self.status}, Accepted: {self.accepted_by_lawyer}'
@@ -60,11 +84,36 @@ class Appointment(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lawyer', 'start_time'], name='appointment_lawyer_start_idx'),
+            models.Index(fields=['client', 'start_time'], name='appointment_client_start_idx'),
+            models.Index(fields=['-start_time', '-id'], name='appointment_start_idx'),
+        ]
+
+
+class BookingLock(models.Model):
+    """One row per lawyer, updated at the start of every booking transaction.
+
+    The UPDATE takes the write lock before the overlap check reads anything,
+    so concurrent bookings for the same lawyer run one after another on every
+    database, SQLite included (see ``apps.cases.availability.lock_calendar``).
+    """
+    lawyer = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name='+', on_delete=models.CASCADE)
+    bookings = models.PositiveBigIntegerField(default=0)
 
 # models.py
+import mimetypes
+import os
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
+from .files import scan_file
+
 def upload_to(instance, filename):
     return f'user_{instance.owner.id}/{instance.folder.id if instance.folder else "root"}/{filename}'
 
@@ -78,15 +127,83 @@ class Document(models.Model):
     folder = models.ForeignKey(Folder, on_delete=models.SET_NULL, null=True, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    size = models.PositiveBigIntegerField(null=True, blank=True, editable=False)
+    content_type = models.CharField(max_length=255, null=True, blank=True, editable=False)
+    sha256 = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-uploaded_at', '-id'], name='document_owner_uploaded_idx'),
+            models.Index(fields=['owner', 'size', 'id'], name='document_owner_size_idx'),
+            models.Index(fields=['owner', 'content_type'], name='document_owner_type_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.file and not self.file._committed:
+            self.record_upload_metadata()
+        super().save(*args, **kwargs)
+
+    def record_upload_metadata(self):
+        """Fill size, content type and checksum from a pending upload.
+
+        Uploads that came through the digest upload handlers were already
+        hashed while streaming in; anything else is scanned once here.
+        """
+        upload = self.file.file
+        digest = getattr(upload, 'sha256', None)
+        if digest is not None:
+            self.size = upload.size
+            self.sha256 = digest
+            self.content_type = upload.sniffed_content_type
+        else:
+            self.size, self.sha256, self.content_type = scan_file(upload, self.file.name)
 
     @property
     def file_size(self):
+        if self.size is not None:
+            return self.size
         return self.file.size
 
     @property
     def mime_type(self):
-        import mimetypes
-        return mimetypes.guess_type(self.file.name)[0]
+        return self.content_type or mimetypes.guess_type(self.file.name)[0]
+
+
+class UploadSession(models.Model):
+    """A resumable upload that is assembled into a ``Document`` once complete.
+
+    Chunks are appended in order to ``part_path``; ``offset`` is the number of
+    bytes received so far and is where the next chunk must start.
+    ``completing`` is set by the one request that is assembling the session.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='upload_sessions')
+    name = models.CharField(max_length=255)
+    folder = models.ForeignKey(Folder, on_delete=models.SET_NULL, null=True, blank=True)
+    total_size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True, null=True)
+    completing = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at'], name='uploadsession_updated_idx'),
+        ]
+
+    @property
+    def part_path(self):
+        return os.path.join(settings.UPLOAD_SESSION_DIR, f'{self.id}.part')
+
+    def discard(self):
+        """Delete the session and whatever was received for it."""
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+        self.delete()
 
     
 # models.py
@@ -98,20 +215,42 @@ User = get_user_model()
 class Thread(models.Model):
     case=models.ForeignKey(Case,on_delete=models.CASCADE)
     participants = models.ManyToManyField(User, related_name="threads")
+    # Sorted participant ids ("3:17"), so a conversation is found with one
+    # indexed equality lookup and can only exist once per case.
+    participant_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['case', 'participant_key'], name='thread_case_participants_uniq'),
+        ]
+
     def __str__(self):
         return f"Thread between {', '.join([p.username for p in self.participants.all()])}"
 
+    @staticmethod
+    def make_participant_key(*users):
+        return ':'.join(str(pk) for pk in sorted({getattr(user, 'pk', user) for user in users}))
+
     @classmethod
-    def get_or_create_thread(cls, user1, user2):
-        """Ensure only one thread exists between two users."""
-        thread = cls.objects.filter(participants=user1).filter(participants=user2).first()
-        if not thread:
-            thread = cls.objects.create()
-            thread.participants.set([user1, user2])
-            thread.save()
-        return thread
+    def get_or_create_thread(cls, user1, user2, case):
+        """Ensure only one thread exists between two users on a case.
+
+        Returns ``(thread, created)`` like ``QuerySet.get_or_create``.
+        """
+        key = cls.make_participant_key(user1, user2)
+        case_id = getattr(case, 'pk', case)
+        thread = cls.objects.filter(case_id=case_id, participant_key=key).first()
+        if thread:
+            return thread, False
+        try:
+            with transaction.atomic():
+                thread = cls.objects.create(case_id=case_id, participant_key=key)
+                thread.participants.set([user1, user2])
+        except IntegrityError:
+            # Someone else created it between our lookup and insert.
+            return cls.objects.get(case_id=case_id, participant_key=key), False
+        return thread, True
 
     
 class Message(models.Model):
@@ -122,10 +261,22 @@ class Message(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     receiver = models.ForeignKey(User, related_name='received_messages', on_delete=models.CASCADE)
     is_read = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['thread', 'created_at', 'id'], name='message_thread_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='message_created_idx'),
+            # Only unread rows are indexed, so per-thread unread counts stay cheap.
+            models.Index(fields=['thread', 'receiver'], condition=models.Q(is_read=False), name='message_unread_idx'),
+        ]
 # models.py
 from django.db import models
 
 
+def default_due_date():
+    return timezone.localdate() + timedelta(days=settings.INVOICE_PAYMENT_TERMS_DAYS)
+
+
 class Invoice(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -140,9 +291,45 @@ class Invoice(models.Model):
     paid_at = models.DateTimeField(null=True, blank=True)
     description = models.TextField(blank=True, null=True)
     status= models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    due_date = models.DateField(null=True, blank=True, default=default_due_date)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lawyer', 'status'], name='invoice_lawyer_status_idx'),
+            models.Index(fields=['-created_at', '-id'], name='invoice_created_idx'),
+            # Only unpaid invoices can fall overdue, so only they are indexed.
+            models.Index(fields=['due_date', 'id'], name='invoice_pending_due_idx',
+                         condition=models.Q(status='pending')),
+        ]
+
     def __str__(self):
         return f"Invoice #{self.id} for {self.case.title}"
 
+
+class InvoiceRollup(models.Model):
+    """Invoice count and total per lawyer, client, month and status.
+
+    Maintained by ``apps.cases.rollups`` as invoices are saved and deleted;
+    ``rebuild_invoice_rollups`` recomputes it from scratch.
+    """
+    lawyer = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    client = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='+', on_delete=models.CASCADE)
+    month = models.DateField()
+    status = models.CharField(max_length=20, choices=Invoice.STATUS_CHOICES)
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lawyer', 'client', 'month', 'status'], name='invoice_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['client', 'month'], name='invoice_rollup_client_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.month:%Y-%m} {self.status}: {self.count} invoices"
+
 # Example: apps/messages/models.py
 # models.py
 
@@ -165,5 +352,12 @@ class CaseRequest(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     case = models.ForeignKey(Case, on_delete=models.CASCADE, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['lawyer', '-created_at'], name='caserequest_lawyer_created_idx'),
+            models.Index(fields=['client', '-created_at'], name='caserequest_client_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.client} -> {self.lawyer} | {self.status}"
@@ -0,0 +1,124 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+from rest_framework.utils.urls import remove_query_param
+
+
+def keyset_filter(ordering, values):
+    """Rows strictly after ``values`` in ``ordering``.
+
+    ``(a, b) < (x, y)`` is spelled out as ``a <= x AND (a < x OR (a = x AND
+    b < y))`` so the leading column stays an index range.
+    """
+    first = ordering[0].lstrip('-')
+    bound = Q(**{f"{first}__{'lte' if ordering[0].startswith('-') else 'gte'}": values[0]})
+    after, equal = Q(), {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        after |= Q(**equal, **{f"{name}__{'lt' if field.startswith('-') else 'gt'}": value})
+        equal[name] = value
+    return bound & after
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on a timestamp with the primary key as tie-breaker.
+
+    The cursor holds the values of every ordering column for the row at the
+    edge of the page, and the next page starts strictly after that row, so
+    rows sharing a timestamp are neither skipped nor repeated and the cost of
+    a page does not grow with how deep it is. The ordering must therefore end
+    in a unique column.
+
+    Views can override the ordering with a ``cursor_ordering`` attribute when
+    their model has no ``created_at`` column, or with ``get_cursor_ordering()``
+    when the client may choose the sort.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
+
+    def get_ordering(self, request, queryset, view):
+        if hasattr(view, 'get_cursor_ordering'):
+            return view.get_cursor_ordering()
+        return getattr(view, 'cursor_ordering', self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = tuple(self.get_ordering(request, queryset, view))
+        self.fields = [queryset.model._meta.get_field(field.lstrip('-')) for field in self.ordering]
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor and self.cursor.position is not None:
+            queryset = queryset.filter(keyset_filter(ordering, self._decode_position(self.cursor.position)))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Nothing is left before a reverse cursor: the list starts here.
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=self._encode_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=self._encode_position(self.page[0])))
+
+    def _encode_position(self, instance):
+        return json.dumps([field.value_to_string(instance) for field in self.fields])
+
+    def _decode_position(self, position):
+        try:
+            values = json.loads(position)
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError
+            values = [field.to_python(value) for field, value in zip(self.fields, values)]
+            if None in values:
+                raise ValueError
+            return values
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+def encode_keyset(created_at, pk):
+    """Opaque cursor pointing at a ``(created_at, id)`` position."""
+    return base64.urlsafe_b64encode(f'{created_at.isoformat()}|{pk}'.encode()).decode()
+
+
+def decode_keyset(cursor):
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        created_at = None
+    if created_at is None:
+        raise ValidationError({'before': 'Invalid cursor.'})
+    return created_at, pk
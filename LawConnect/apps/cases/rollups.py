@@ -0,0 +1,94 @@
+"""Incremental invoice rollups.
+
+``InvoiceRollup`` holds one row per (lawyer, client, month, status). The
+signals in ``apps.cases.signals`` move an invoice's amount between rows as it
+is created, edited or deleted. Code that changes invoices with
+``QuerySet.update()`` bypasses those signals and must call ``move_invoices``
+itself.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Invoice, InvoiceRollup
+
+
+def month_of(moment):
+    moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    return date(moment.year, moment.month, 1)
+
+
+def rollup_key(invoice):
+    """``(lawyer_id, client_id, month, status)`` for ``invoice``, or ``None`` if unsaved."""
+    if invoice.created_at is None or invoice.lawyer_id is None or invoice.client_id is None:
+        return None
+    return invoice.lawyer_id, invoice.client_id, month_of(invoice.created_at), invoice.status
+
+
+def adjust(key, count, total):
+    lawyer_id, client_id, month, status = key
+    fields = dict(lawyer_id=lawyer_id, client_id=client_id, month=month, status=status)
+    with transaction.atomic():
+        InvoiceRollup.objects.bulk_create([InvoiceRollup(**fields)], ignore_conflicts=True)
+        InvoiceRollup.objects.filter(**fields).update(count=F('count') + count, total=F('total') + total)
+
+
+def record_change(old, new):
+    """Apply the move from ``old`` to ``new``; each is ``(key, amount)`` or ``None``."""
+    if old == new:
+        return
+    if old is not None and old[0] is not None:
+        adjust(old[0], -1, -old[1])
+    if new is not None and new[0] is not None:
+        adjust(new[0], 1, new[1])
+
+
+def move_invoices(invoices, status):
+    """Account for ``invoices`` (values rows) switching to ``status`` in bulk.
+
+    Each row needs ``lawyer_id``, ``client_id``, ``created_at``, ``status`` and
+    ``amount``. Rows are grouped so each affected rollup is touched once.
+    """
+    moves = {}
+    for row in invoices:
+        if row['status'] == status:
+            continue
+        month = month_of(row['created_at'])
+        tally(moves, (row['lawyer_id'], row['client_id'], month, row['status']), -1, row['amount'])
+        tally(moves, (row['lawyer_id'], row['client_id'], month, status), 1, row['amount'])
+    apply_moves(moves)
+
+
+def add_invoices(invoices):
+    """Account for ``invoices`` that were inserted with ``bulk_create``."""
+    moves = {}
+    for invoice in invoices:
+        tally(moves, rollup_key(invoice), 1, invoice.amount)
+    apply_moves(moves)
+
+
+def tally(moves, key, sign, amount):
+    count, total = moves.get(key, (0, 0))
+    moves[key] = (count + sign, total + sign * amount)
+
+
+def apply_moves(moves):
+    for key, (count, total) in moves.items():
+        if count or total:
+            adjust(key, count, total)
+
+
+def rebuild():
+    """Recompute every rollup row from the invoice table."""
+    rows = (Invoice.objects
+            .annotate(month=TruncMonth('created_at', output_field=DateField()))
+            .values('lawyer_id', 'client_id', 'month', 'status')
+            .annotate(count=Count('id'), total=Sum('amount'))
+            .order_by())
+    with transaction.atomic():
+        InvoiceRollup.objects.all().delete()
+        InvoiceRollup.objects.bulk_create((InvoiceRollup(**row) for row in rows.iterator()), batch_size=1000)
+    return InvoiceRollup.objects.count()
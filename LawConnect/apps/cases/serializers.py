@@ -1,3 +1,6 @@
+from urllib.parse import urljoin
+
+from django.conf import settings
 from rest_framework import serializers
 
 from apps.users.serializers import UserRegistrationSerializer
@@ -20,11 +23,22 @@ class AppointmentSerializer(serializers.ModelSerializer):
         model = Appointment
         fields = '__all__'
 
+    def validate(self, attrs):
+        start = attrs.get('start_time', getattr(self.instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(self.instance, 'end_time', None))
+        if start and end:
+            if end <= start:
+                raise serializers.ValidationError({'end_time': "Must be after start_time."})
+            if end - start > settings.APPOINTMENT_MAX_DURATION:
+                raise serializers.ValidationError(
+                    {'end_time': f"Appointments can last at most {settings.APPOINTMENT_MAX_DURATION}."})
+        return attrs
+
 from rest_framework import serializers
-from .models import Document, Folder
+from .models import Document, Folder, UploadSession
 
 class DocumentSerializer(serializers.ModelSerializer):
-    file_size = serializers.ReadOnlyField()
+    file_size = serializers.IntegerField(source='size', read_only=True)
     mime_type = serializers.ReadOnlyField()
     url = serializers.SerializerMethodField()
 
@@ -36,8 +50,26 @@ class DocumentSerializer(serializers.ModelSerializer):
             'owner': {'required': True}
         }
     def get_url(self, obj):
-        request = self.context.get('request')
-        return request.build_absolute_uri(obj.file.url)
+        # Resolve the host once per listing instead of once per row.
+        base = self.context.get('absolute_base')
+        if base is None:
+            request = self.context.get('request')
+            base = request.build_absolute_uri('/') if request else ''
+            self.context['absolute_base'] = base
+        return urljoin(base, obj.file.url)
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    total_size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'name', 'folder', 'total_size', 'sha256', 'chunk_size', 'offset', 'created_at']
+        read_only_fields = ['chunk_size', 'offset', 'created_at']
+
+    def validate_folder(self, folder):
+        if folder is not None and folder.owner_id != self.context['request'].user.id:
+            raise serializers.ValidationError("Folder not found.")
+        return folder
 
 class FolderSerializer(serializers.ModelSerializer):
     count = serializers.SerializerMethodField()
@@ -47,7 +79,10 @@ class FolderSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'count']
 
     def get_count(self, obj):
-        return obj.document_set.count()
+        count = getattr(obj, 'document_count', None)
+        if count is None:
+            count = obj.document_set.count()
+        return count
 
 
 # serializers.py
@@ -68,14 +103,50 @@ from .models import Message, Thread, Case
 # Thread Serializer
 class ThreadSerializer(serializers.ModelSerializer):
     participants = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.all(), many=True)
+    unread_count = serializers.SerializerMethodField()
+    last_message = serializers.SerializerMethodField()
 
     class Meta:
         model = Thread
-        fields = ['id', 'participants', 'created_at','case']
+        fields = ['id', 'participants', 'created_at','case', 'unread_count', 'last_message']
+
+    def get_unread_count(self, obj):
+        return getattr(obj, 'unread_count', 0)
+
+    def get_last_message(self, obj):
+        if getattr(obj, 'last_message_id', None) is None:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'content': obj.last_message_preview,
+            'sender': obj.last_message_sender,
+            'created_at': obj.last_message_at,
+        }
+
+    def validate(self, attrs):
+        if self.instance is None:
+            participants = set(attrs.get('participants', []))
+            request = self.context.get('request')
+            if request is not None:
+                participants.add(request.user)
+            if len(participants) != 2:
+                raise serializers.ValidationError({'participants': "A thread is between exactly two users."})
+            attrs['participants'] = sorted(participants, key=lambda user: user.pk)
+        elif 'case' in attrs and attrs['case'] != self.instance.case:
+            # Its messages belong to the case, and the target case may already
+            # have a thread for the same pair.
+            raise serializers.ValidationError({'case': "A thread cannot be moved to another case."})
+        return attrs
+
     def create(self, validated_data):
-        participants = validated_data.pop('participants')
-        thread = Thread.get_or_create_thread(*participants)
+        thread, _ = Thread.get_or_create_thread(*validated_data['participants'], validated_data['case'])
         return thread
+
+    def update(self, instance, validated_data):
+        # The participant key and case are fixed at creation.
+        validated_data.pop('participants', None)
+        validated_data.pop('case', None)
+        return super().update(instance, validated_data)
 class MessageSerializer(serializers.ModelSerializer):
     sender = serializers.StringRelatedField(read_only=True)
     receiver = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
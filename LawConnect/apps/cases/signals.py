@@ -0,0 +1,54 @@
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_dashboards
+from .models import Appointment, Case, CaseRequest, Invoice
+from .rollups import record_change, rollup_key
+
+
+def invoice_state(invoice):
+    return rollup_key(invoice), invoice.amount
+
+
+@receiver(post_init, sender=Invoice)
+def remember_invoice_state(sender, instance, **kwargs):
+    # Deferred loads (.only()) would trigger queries here; they never save.
+    if not instance.get_deferred_fields():
+        instance._rollup_state = invoice_state(instance)
+
+
+@receiver(pre_save, sender=Invoice)
+def load_invoice_state(sender, instance, raw=False, **kwargs):
+    # Instances built by hand or loaded with deferred fields have no snapshot.
+    if raw or instance.pk is None or hasattr(instance, '_rollup_state'):
+        return
+    stored = Invoice.objects.filter(pk=instance.pk).first()
+    if stored is not None:
+        instance._rollup_state = stored._rollup_state
+
+
+@receiver(post_save, sender=Invoice)
+def update_invoice_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new = invoice_state(instance)
+    record_change(None if created else getattr(instance, '_rollup_state', None), new)
+    instance._rollup_state = new
+
+
+@receiver(post_delete, sender=Invoice)
+def remove_invoice_from_rollup(sender, instance, **kwargs):
+    record_change(getattr(instance, '_rollup_state', invoice_state(instance)), None)
+
+
+@receiver(post_save, sender=Case)
+@receiver(post_delete, sender=Case)
+@receiver(post_save, sender=CaseRequest)
+@receiver(post_delete, sender=CaseRequest)
+@receiver(post_save, sender=Appointment)
+@receiver(post_delete, sender=Appointment)
+@receiver(post_save, sender=Invoice)
+@receiver(post_delete, sender=Invoice)
+def invalidate_participant_dashboards(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_dashboards(instance.client_id, instance.lawyer_id)
@@ -1,6 +1,37 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, Sum
+from django.core.files.storage import FileSystemStorage
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path as path_route
+from django.utils import timezone
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from rest_framework.test import APIClient, APITestCase
+
 from apps.users.models import User
-from apps.cases.models import Case
+from apps.users.tests import make_lawyer
+from apps.cases.files import sniff_content_type
+from apps.cases.rollups import move_invoices
+from apps.cases.uploads import ChunkError, write_chunk
+from apps.cases.management.commands.sweep_overdue_invoices import Command as SweepCommand
+from LawConnect.consumers import ChatConsumer, message_buffer
+from apps.cases.models import Appointment, Case, CaseRequest, Document, Folder, Invoice, InvoiceRollup, Message, Thread, UploadSession
 
 class CaseTestCase(TestCase):
     def setUp(self):
@@ -13,3 +44,974 @@ class CaseTestCase(TestCase):
         self.assertEqual(case.title, 'Case 1')
         self.assertEqual(case.client.username, 'clientuser')
         self.assertEqual(case.lawyer.username, 'lawyeruser')
+
+
+class CaseListPaginationTest(APITestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='pageclient', email='pageclient@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('pagelawyer')
+        cases = [
+            Case(title=f'Case {i}', description='d', type='civil' if i % 2 else 'criminal',
+                 status='closed' if i % 3 == 0 else 'open', client=self.client_user,
+                 lawyer=self.lawyer if i < 5 else None)
+            for i in range(12)
+        ]
+        Case.objects.bulk_create(cases)
+        # Give every row the same timestamp so paging relies on the id tie-breaker.
+        Case.objects.update(created_at=timezone.now())
+        self.client.force_authenticate(self.client_user)
+
+    def test_cursor_pages_cover_every_row_once(self):
+        seen = []
+        url = '/law/cases/?page_size=5'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_cursor_is_a_keyset_not_an_offset(self):
+        first = self.client.get('/law/cases/?page_size=5')
+        # Newer rows arriving between requests do not shift the next page.
+        Case.objects.create(title='Newest', description='d', type='civil', client=self.client_user)
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(first.data['next'])
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+        first_ids = [row['id'] for row in first.data['results']]
+        second_ids = [row['id'] for row in second.data['results']]
+        self.assertEqual(second_ids, [first_ids[-1] - i for i in range(1, 6)])
+
+        previous = self.client.get(second.data['previous'])
+        self.assertEqual([row['id'] for row in previous.data['results']], first_ids)
+        self.assertIsNotNone(previous.data['previous'])
+
+    def test_tampered_cursor_is_rejected(self):
+        response = self.client.get('/law/cases/?cursor=cD1nYXJiYWdl')
+        self.assertEqual(response.status_code, 404)
+
+    def test_filters_run_server_side(self):
+        response = self.client.get(f'/law/cases/?status=open&type=civil&lawyer={self.lawyer.id}')
+        titles = {row['title'] for row in response.data['results']}
+        self.assertEqual(titles, {'Case 1'})
+
+    def test_date_range_filter(self):
+        Case.objects.filter(title='Case 0').update(created_at=timezone.now() - timedelta(days=30))
+        since = (timezone.now() - timedelta(days=7)).date().isoformat()
+        response = self.client.get(f'/law/cases/?created_after={since}')
+        self.assertEqual(len(response.data['results']), 11)
+        response = self.client.get(f'/law/cases/?created_before={since}')
+        self.assertEqual([row['title'] for row in response.data['results']], ['Case 0'])
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get('/law/cases/?client=abc')
+        self.assertEqual(response.status_code, 400)
+
+
+class HotQueryIndexTest(TestCase):
+    """The hot list queries should be index range scans, not sort-after-filter."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='idxuser', email='idxuser@example.com', password='testpass', role='client')
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_case_by_lawyer_and_status(self):
+        self.assertUsesIndex(Case.objects.filter(lawyer=self.user, status='open'), 'case_lawyer_status_idx')
+
+    def test_case_cursor_ordering(self):
+        self.assertUsesIndex(Case.objects.order_by('-created_at', '-id')[:50], 'case_created_idx')
+
+    def test_case_requests_by_lawyer(self):
+        self.assertUsesIndex(CaseRequest.objects.filter(lawyer=self.user).order_by('-created_at'), 'caserequest_lawyer_created_idx')
+
+    def test_appointments_by_lawyer(self):
+        queryset = Appointment.objects.filter(lawyer=self.user, start_time__gte=timezone.now()).order_by('start_time')
+        self.assertUsesIndex(queryset, 'appointment_lawyer_start_idx')
+
+    def test_invoices_by_lawyer_and_status(self):
+        self.assertUsesIndex(Invoice.objects.filter(lawyer=self.user, status='pending'), 'invoice_lawyer_status_idx')
+
+    def test_thread_messages_in_order(self):
+        self.assertUsesIndex(Message.objects.filter(thread_id=1).order_by('created_at', 'id'), 'message_thread_created_idx')
+
+    def test_list_cursor_orderings(self):
+        self.assertUsesIndex(Message.objects.order_by('-created_at', '-id')[:50], 'message_created_idx')
+        self.assertUsesIndex(Invoice.objects.order_by('-created_at', '-id')[:50], 'invoice_created_idx')
+        self.assertUsesIndex(Appointment.objects.order_by('-start_time', '-id')[:50], 'appointment_start_idx')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentListingQueryTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='docowner', email='docowner@example.com', password='testpass', role='client')
+        self.client.force_authenticate(self.owner)
+
+    def test_folder_counts_come_from_one_query(self):
+        for i in range(5):
+            folder = Folder.objects.create(name=f'Folder {i}', owner=self.owner)
+            for j in range(i):
+                Document.objects.create(name=f'doc-{i}-{j}', owner=self.owner, folder=folder,
+                                        file=ContentFile(b'x', name='doc.txt'))
+        with self.assertNumQueries(1):
+            response = self.client.get('/law/folders/')
+        counts = {row['name']: row['count'] for row in response.data['results']}
+        self.assertEqual(counts, {f'Folder {i}': i for i in range(5)})
+
+    def test_document_listing_does_not_touch_storage(self):
+        for i in range(3):
+            Document.objects.create(name=f'doc-{i}', owner=self.owner, file=ContentFile(b'hello', name='hello.txt'))
+        with mock.patch.object(FileSystemStorage, 'size', side_effect=AssertionError('storage stat')), \
+                mock.patch.object(FileSystemStorage, 'exists', side_effect=AssertionError('storage stat')):
+            response = self.client.get('/law/documents/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['file_size'] for row in response.data['results']], [5, 5, 5])
+        self.assertTrue(response.data['results'][0]['url'].startswith('http://testserver/media/'))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentMetadataTest(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='metaowner', email='metaowner@example.com', password='testpass', role='client')
+        self.client.force_authenticate(self.owner)
+
+    def test_upload_records_metadata_while_streaming(self):
+        body = b'%PDF-1.7\n' + b'0' * 4096
+        upload = SimpleUploadedFile('scan.bin', body)
+        with mock.patch('apps.cases.models.scan_file', side_effect=AssertionError('second read')):
+            response = self.client.post('/law/documents/', {'name': 'Scan', 'owner': self.owner.id, 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(document.size, len(body))
+        self.assertEqual(document.sha256, hashlib.sha256(body).hexdigest())
+        self.assertEqual(document.content_type, 'application/pdf')
+        self.assertEqual(response.data['mime_type'], 'application/pdf')
+
+    def test_sniffing_prefers_bytes_over_name(self):
+        self.assertEqual(sniff_content_type(b'\x89PNG\r\n\x1a\n....', 'photo.pdf'), 'image/png')
+        self.assertEqual(sniff_content_type(b'PK\x03\x04....', 'brief.docx'),
+                         'application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+        self.assertEqual(sniff_content_type(b'plain notes', 'notes'), 'text/plain')
+
+    def test_backfill_command_fills_legacy_rows(self):
+        document = Document.objects.create(name='old', owner=self.owner, file=ContentFile(b'GIF89a....', name='old.gif'))
+        Document.objects.filter(pk=document.pk).update(size=None, content_type=None, sha256=None)
+        call_command('backfill_document_metadata', batch_size=1, stdout=StringIO())
+        document.refresh_from_db()
+        self.assertEqual(document.size, 10)
+        self.assertEqual(document.content_type, 'image/gif')
+        self.assertEqual(document.sha256, hashlib.sha256(b'GIF89a....').hexdigest())
+
+    def test_listing_sorts_and_filters_by_size_and_type(self):
+        for name, body in (('a.txt', b'aaaa'), ('b.pdf', b'%PDF-' + b'b' * 20), ('c.txt', b'cc')):
+            Document.objects.create(name=name, owner=self.owner, file=ContentFile(body, name=name))
+        response = self.client.get('/law/documents/?sort=size')
+        self.assertEqual([row['name'] for row in response.data['results']], ['c.txt', 'a.txt', 'b.pdf'])
+        response = self.client.get('/law/documents/?content_type=text/plain&min_size=3')
+        self.assertEqual([row['name'] for row in response.data['results']], ['a.txt'])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class DocumentDownloadTest(APITestCase):
+    body = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='dlowner', email='dlowner@example.com', password='testpass', role='client')
+        self.document = Document.objects.create(name='brief', owner=self.owner, file=ContentFile(self.body, name='brief.pdf'))
+        self.url = f'/law/api/download/{self.document.pk}/'
+        self.etag = f'"{self.document.sha256}"'
+        self.client.force_authenticate(self.owner)
+
+    def test_full_download_carries_validators(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.body)
+        self.assertEqual(response['ETag'], self.etag)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('Last-Modified', response)
+
+    def test_if_none_match_returns_304(self):
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.body)}')
+        self.assertEqual(b''.join(response.streaming_content), self.body[100:200])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-10')
+        self.assertEqual(b''.join(response.streaming_content), self.body[-10:])
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={len(self.body)}-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_stale_if_range_serves_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_users_cannot_download(self):
+        other = User.objects.create_user(username='dlother', email='dlother@example.com', password='testpass', role='client')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    @override_settings(DOCUMENT_DOWNLOAD_OFFLOAD='x-accel')
+    def test_offload_to_front_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.document.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], self.etag)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_SESSION_DIR=tempfile.mkdtemp(), UPLOAD_CHUNK_SIZE=1024)
+class ResumableUploadTest(APITestCase):
+    body = b'%PDF-1.5\n' + b'evidence ' * 300
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='chunkowner', email='chunkowner@example.com', password='testpass', role='client')
+        self.client.force_authenticate(self.owner)
+
+    def start(self, **extra):
+        response = self.client.post('/law/uploads/', {'name': 'bundle.pdf', 'total_size': len(self.body), **extra})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def put_chunk(self, session, offset, data, checksum=None):
+        return self.client.put(
+            f"/law/uploads/{session['id']}/chunk/", data, content_type='application/octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset), HTTP_UPLOAD_CHECKSUM=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_chunks_assemble_into_a_document(self):
+        session = self.start(sha256=hashlib.sha256(self.body).hexdigest())
+        for offset in range(0, len(self.body), session['chunk_size']):
+            response = self.put_chunk(session, offset, self.body[offset:offset + session['chunk_size']])
+            self.assertEqual(response.status_code, 200, response.data)
+
+        response = self.client.post(f"/law/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 201, response.data)
+        document = Document.objects.get(pk=response.data['id'])
+        self.assertEqual(document.file.read(), self.body)
+        self.assertEqual(document.content_type, 'application/pdf')
+        self.assertEqual(document.sha256, hashlib.sha256(self.body).hexdigest())
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_bad_chunk_is_rolled_back_and_upload_resumes(self):
+        session = self.start()
+        chunk = self.body[:1024]
+        self.assertEqual(self.put_chunk(session, 0, chunk, checksum='0' * 64).status_code, 400)
+        self.assertEqual(self.client.get(f"/law/uploads/{session['id']}/").data['offset'], 0)
+
+        self.assertEqual(self.put_chunk(session, 0, chunk).status_code, 200)
+        # Replaying a chunk the server already has reports where to resume.
+        response = self.put_chunk(session, 0, chunk)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['offset'], 1024)
+
+        response = self.client.post(f"/law/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 409)
+
+    def test_stale_retry_never_touches_committed_bytes(self):
+        session = self.start()
+        stale = UploadSession.objects.get(pk=session['id'])
+        chunk = self.body[:1024]
+        self.assertEqual(self.put_chunk(session, 0, chunk).status_code, 200)
+
+        with self.assertRaises(ChunkError) as bad:
+            write_chunk(stale, BytesIO(b'x' * 1024), 0, 1024, '0' * 64)
+        self.assertEqual(bad.exception.status, 400)
+        with self.assertRaises(ChunkError) as lost:
+            write_chunk(stale, BytesIO(b'x' * 1024), 0, 1024, hashlib.sha256(b'x' * 1024).hexdigest())
+        self.assertEqual(lost.exception.status, 409)
+        self.assertEqual(stale.offset, 1024)
+        with open(stale.part_path, 'rb') as part:
+            self.assertEqual(part.read(), chunk)
+        self.assertFalse([name for name in os.listdir(settings.UPLOAD_SESSION_DIR) if name.endswith('.chunk')])
+
+    def test_short_part_file_is_not_assembled(self):
+        session = self.start()
+        for offset in range(0, len(self.body), session['chunk_size']):
+            self.put_chunk(session, offset, self.body[offset:offset + session['chunk_size']])
+        with open(UploadSession.objects.get(pk=session['id']).part_path, 'r+b') as part:
+            part.truncate(0)
+        response = self.client.post(f"/law/uploads/{session['id']}/complete/")
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Document.objects.exists())
+
+    def test_abandoned_sessions_are_collected(self):
+        session = UploadSession.objects.get(pk=self.start()['id'])
+        UploadSession.objects.filter(pk=session.pk).update(updated_at=timezone.now() - timedelta(days=2))
+        call_command('cleanup_upload_sessions', stdout=StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(session.part_path))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), UPLOAD_SESSION_DIR=tempfile.mkdtemp())
+class UploadCompletionRaceTest(TransactionTestCase):
+    body = b'%PDF-1.5\n' + b'evidence ' * 300
+
+    def setUp(self):
+        self.owner = User.objects.create_user(username='raceuploader', email='raceuploader@example.com', password='testpass', role='client')
+        self.session = UploadSession.objects.create(owner=self.owner, name='bundle.pdf', total_size=len(self.body),
+                                                    chunk_size=len(self.body), offset=len(self.body))
+        with open(self.session.part_path, 'wb') as part:
+            part.write(self.body)
+
+    def test_parallel_completes_create_one_document(self):
+        barrier = threading.Barrier(4)
+        results = []
+
+        def complete():
+            api = APIClient()
+            api.force_authenticate(self.owner)
+            try:
+                barrier.wait()
+                results.append(api.post(f'/law/uploads/{self.session.id}/complete/').status_code)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=complete) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(sorted(results), [201, 409, 409, 409])
+        self.assertEqual(Document.objects.filter(owner=self.owner).count(), 1)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_failed_completion_releases_the_claim(self):
+        UploadSession.objects.filter(pk=self.session.pk).update(sha256='0' * 64)
+        self.client = APIClient()
+        self.client.force_authenticate(self.owner)
+        self.assertEqual(self.client.post(f'/law/uploads/{self.session.id}/complete/').status_code, 400)
+        self.assertFalse(UploadSession.objects.get(pk=self.session.pk).completing)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class ChatConsumerTest(TransactionTestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', email='alice@example.com', password='testpass', role='client')
+        self.bob = make_lawyer('bob')
+        self.case = Case.objects.create(title='Chat case', description='d', type='civil', client=self.alice, lawyer=self.bob)
+
+    async def connect(self, user, peer, case_id=None, accepted=True):
+        path = f'/ws/chat/{peer.id}/' + (f'?case_id={case_id}' if case_id else '')
+        communicator = WebsocketCommunicator(URLRouter([path_route('ws/chat/<int:room_name>/', ChatConsumer.as_asgi())]), path)
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertEqual(connected, accepted)
+        return communicator
+
+    async def test_messages_broadcast_before_they_are_persisted(self):
+        alice = await self.connect(self.alice, self.bob, case_id=self.case.id)
+        bob = await self.connect(self.bob, self.alice)
+
+        with mock.patch.object(message_buffer, 'max_delay', 60):
+            for i in range(3):
+                await alice.send_json_to({'message': f'hello {i}'})
+                received = await bob.receive_json_from()
+                self.assertEqual(received['message'], f'hello {i}')
+                self.assertEqual(received['case_id'], self.case.id)
+            self.assertEqual(await database_sync_to_async(Message.objects.count)(), 0)
+
+            with mock.patch.object(Message.objects, 'bulk_create', wraps=Message.objects.bulk_create) as bulk_create:
+                await alice.disconnect()
+            self.assertEqual(bulk_create.call_count, 1)
+
+        contents = await database_sync_to_async(
+            lambda: list(Message.objects.order_by('id').values_list('content', 'receiver_id', 'thread__case_id'))
+        )()
+        self.assertEqual(contents, [(f'hello {i}', self.bob.id, self.case.id) for i in range(3)])
+        await bob.disconnect()
+
+    async def test_unknown_case_is_reported(self):
+        alice = await self.connect(self.alice, self.bob)
+        await alice.send_json_to({'message': 'hi', 'case_id': 999999})
+        self.assertEqual(await alice.receive_json_from(), {'error': 'Case not found'})
+        await alice.disconnect()
+
+    async def test_outsiders_cannot_open_a_case_thread(self):
+        mallory = await database_sync_to_async(User.objects.create_user)(
+            username='mallory', email='mallory@example.com', password='testpass', role='client')
+        await self.connect(mallory, self.bob, case_id=self.case.id, accepted=False)
+        alice = await self.connect(self.alice, mallory)
+        await alice.send_json_to({'message': 'hi', 'case_id': self.case.id})
+        self.assertEqual(await alice.receive_json_from(), {'error': 'Case not found'})
+        await alice.disconnect()
+        self.assertFalse(await database_sync_to_async(Thread.objects.exists)())
+
+    async def test_benchmark_reports_every_delivery(self):
+        from benchmarks.chat_consumer import run_benchmark
+
+        result = await run_benchmark(pairs=3, rounds=2, memory_sample=2)
+        self.assertEqual(result['clients'], 6)
+        self.assertEqual(result['deliveries'], 24)
+        self.assertEqual(result['messages_persisted'], 12)
+        self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
+
+
+class ThreadKeyTest(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='keyalice', email='keyalice@example.com', password='testpass', role='client')
+        self.bob = User.objects.create_user(username='keybob', email='keybob@example.com', password='testpass', role='client')
+        self.case = Case.objects.create(title='Keyed', description='d', type='civil', client=self.alice)
+
+    def test_lookup_is_one_query_and_order_independent(self):
+        thread, created = Thread.get_or_create_thread(self.alice, self.bob, self.case)
+        self.assertTrue(created)
+        self.assertEqual(thread.participant_key, f'{min(self.alice.id, self.bob.id)}:{max(self.alice.id, self.bob.id)}')
+        with self.assertNumQueries(1):
+            self.assertEqual(Thread.get_or_create_thread(self.bob, self.alice, self.case.id), (thread, False))
+
+    def test_lost_insert_race_returns_the_winner(self):
+        winner, _ = Thread.get_or_create_thread(self.alice, self.bob, self.case)
+        with mock.patch.object(Thread.objects, 'filter', return_value=Thread.objects.none()):
+            self.assertEqual(Thread.get_or_create_thread(self.alice, self.bob, self.case), (winner, False))
+        self.assertEqual(Thread.objects.filter(case=self.case).count(), 1)
+
+    def test_thread_cannot_move_to_another_case(self):
+        other_case = Case.objects.create(title='Other', description='d', type='civil', client=self.alice)
+        Thread.get_or_create_thread(self.alice, self.bob, other_case)
+        thread, _ = Thread.get_or_create_thread(self.alice, self.bob, self.case)
+        self.client.force_authenticate(self.alice)
+        response = self.client.patch(f'/law/threads/{thread.id}/', {'case': other_case.id}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('case', response.data)
+        thread.refresh_from_db()
+        self.assertEqual(thread.case, self.case)
+
+    def test_create_endpoint_reuses_the_existing_thread(self):
+        self.client.force_authenticate(self.alice)
+        first = self.client.post('/law/threads/', {'participants': [self.bob.id], 'case': self.case.id}, format='json')
+        second = self.client.post('/law/threads/', {'participants': [self.bob.id], 'case': self.case.id}, format='json')
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(sorted(first.data['participants']), sorted([self.alice.id, self.bob.id]))
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class CaseAcceptanceTest(TransactionTestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='acceptclient', email='acceptclient@example.com', password='testpass', role='client')
+        self.lawyers = [make_lawyer(f'acceptlawyer{i}') for i in range(8)]
+        self.case = Case.objects.create(title='Contested', description='d', type='civil', client=self.client_user)
+
+    def test_parallel_accepts_have_exactly_one_winner(self):
+        barrier = threading.Barrier(len(self.lawyers))
+        results = {}
+
+        def accept(lawyer):
+            api = APIClient()
+            api.force_authenticate(lawyer)
+            try:
+                barrier.wait()
+                results[lawyer.id] = api.post(f'/law/cases/{self.case.id}/accept/').status_code
+            finally:
+                connection.close()
+
+        with override_settings(NOTIFICATION_DELIVERY='sync'):
+            workers = [threading.Thread(target=accept, args=(lawyer,)) for lawyer in self.lawyers]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        winners = [lawyer_id for lawyer_id, code in results.items() if code == 200]
+        self.assertEqual(len(winners), 1)
+        self.assertEqual(sorted(results.values()), [200] + [400] * (len(self.lawyers) - 1))
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.lawyer_id, self.case.status), (winners[0], 'in_review'))
+        self.assertEqual(Thread.objects.filter(case=self.case).count(), 1)
+        self.assertEqual(self.client_user.notifications.filter(type='case').count(), 1)
+
+
+    @override_settings(NOTIFICATION_DELIVERY='sync')
+    def test_staff_accept_puts_the_lawyer_in_the_thread(self):
+        api = APIClient()
+        api.force_authenticate(self.client_user)
+        lawyer = self.lawyers[0]
+        response = api.post(f'/law/cases/{self.case.id}/accept/', {'lawyer': lawyer.id, 'accepted_by_lawyer': 999999})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Case.objects.get(pk=self.case.pk).status, 'open')
+
+        response = api.post(f'/law/cases/{self.case.id}/accept/', {'lawyer': lawyer.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['thread_created'])
+        thread = Thread.objects.get(pk=response.data['thread_id'])
+        self.assertEqual(set(thread.participants.values_list('id', flat=True)), {self.client_user.id, lawyer.id})
+        self.case.refresh_from_db()
+        self.assertEqual((self.case.lawyer_id, self.case.accepted_by_lawyer_id), (lawyer.id, lawyer.id))
+
+
+class AppointmentAvailabilityTest(APITestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='slotclient', email='slotclient@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('slotlawyer')
+        self.day = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        for start, end, status in ((9, 10, 'confirmed'), (9.5, 11, 'pending'), (13, 14, 'cancelled'), (15, 16, 'confirmed')):
+            Appointment.objects.create(title='Busy', client=self.client_user, lawyer=self.lawyer, status=status,
+                                       start_time=self.day + timedelta(hours=start), end_time=self.day + timedelta(hours=end))
+        self.client.force_authenticate(self.client_user)
+
+    def at(self, hours):
+        return self.day + timedelta(hours=hours)
+
+    def book(self, start, end, **extra):
+        return self.client.post('/law/appointments/', {
+            'title': 'Consult', 'client': self.client_user.id, 'lawyer': self.lawyer.id,
+            'start_time': self.at(start).isoformat(), 'end_time': self.at(end).isoformat(), **extra,
+        }, format='json')
+
+    def test_free_slots_merge_overlaps_and_skip_cancelled(self):
+        response = self.client.get('/law/appointments/availability/', {
+            'lawyer': self.lawyer.id, 'start': self.at(8).isoformat(), 'end': self.at(17).isoformat(), 'min_minutes': 30,
+        })
+        self.assertEqual(response.status_code, 200)
+        free = [(slot['start'], slot['end']) for slot in response.data['free']]
+        self.assertEqual(free, [(self.at(8), self.at(9)), (self.at(11), self.at(15)), (self.at(16), self.at(17))])
+
+    def test_overlapping_booking_is_rejected(self):
+        self.assertEqual(self.book(10.5, 11.5).status_code, 400)
+        self.assertEqual(self.book(13, 14).status_code, 201)
+        self.assertEqual(self.book(11, 12).status_code, 201)
+
+    def test_rescheduling_ignores_the_appointment_itself(self):
+        appointment = Appointment.objects.get(start_time=self.at(15))
+        response = self.client.patch(f'/law/appointments/{appointment.id}/', {
+            'start_time': self.at(15.5).isoformat(), 'end_time': self.at(16.5).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.patch(f'/law/appointments/{appointment.id}/', {
+            'start_time': self.at(10).isoformat(), 'end_time': self.at(12).isoformat(),
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_overlong_appointments_and_ranges_are_refused(self):
+        self.assertEqual(self.book(0, 12).status_code, 400)
+        response = self.client.get('/law/appointments/availability/', {
+            'lawyer': self.lawyer.id, 'start': self.at(0).isoformat(), 'end': self.at(24 * 40).isoformat(),
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+class AppointmentBookingRaceTest(TransactionTestCase):
+    def setUp(self):
+        self.clients = [User.objects.create_user(username=f'raceclient{i}', email=f'raceclient{i}@example.com',
+                                                 password='testpass', role='client') for i in range(8)]
+        self.lawyer = make_lawyer('racelawyer')
+        self.start = timezone.now().replace(microsecond=0) + timedelta(days=2)
+
+    def test_parallel_overlapping_bookings_have_exactly_one_winner(self):
+        barrier = threading.Barrier(len(self.clients))
+        results = {}
+
+        def book(index, client):
+            api = APIClient()
+            api.force_authenticate(client)
+            start = self.start + timedelta(minutes=5 * index)
+            try:
+                barrier.wait()
+                results[client.id] = api.post('/law/appointments/', {
+                    'title': 'Consult', 'client': client.id, 'lawyer': self.lawyer.id,
+                    'start_time': start.isoformat(), 'end_time': (start + timedelta(hours=1)).isoformat(),
+                }, format='json').status_code
+            finally:
+                connection.close()
+
+        with override_settings(NOTIFICATION_DELIVERY='sync'):
+            workers = [threading.Thread(target=book, args=pair) for pair in enumerate(self.clients)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(sorted(results.values()), [201] + [400] * (len(self.clients) - 1))
+        self.assertEqual(Appointment.objects.filter(lawyer=self.lawyer).count(), 1)
+
+
+class AppointmentFeedTest(APITestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='feedclient', email='feedclient@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('feedlawyer')
+        start = timezone.now() + timedelta(days=1)
+        for i in range(3):
+            Appointment.objects.create(title=f'Hearing; room {i}', client=self.client_user, lawyer=self.lawyer,
+                                       start_time=start + timedelta(hours=i), end_time=start + timedelta(hours=i, minutes=30))
+        self.client.force_authenticate(self.lawyer)
+        self.url = self.client.get('/law/appointments/feed-url/').data['url']
+        self.client.force_authenticate(None)
+
+    def test_feed_streams_events_without_login(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertTrue(body.startswith('BEGIN:VCALENDAR\r\n'))
+        self.assertEqual(body.count('BEGIN:VEVENT'), 3)
+        self.assertIn('SUMMARY:Hearing\\; room 0', body)
+
+    def test_unchanged_feed_is_a_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        Appointment.objects.filter(title='Hearing; room 1').first().save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_tampered_token_is_rejected(self):
+        self.assertEqual(self.client.get(self.url.replace('.ics', 'x.ics')).status_code, 404)
+
+    def test_rotating_the_url_revokes_the_old_one(self):
+        self.client.force_authenticate(self.lawyer)
+        self.assertEqual(self.client.get('/law/appointments/feed-url/').data['url'], self.url)
+        new_url = self.client.post('/law/appointments/feed-url/').data['url']
+        self.client.force_authenticate(None)
+        self.assertNotEqual(new_url, self.url)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(new_url).status_code, 200)
+
+    def test_empty_feed_is_served_while_the_token_is_current(self):
+        Appointment.objects.all().delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('BEGIN:VEVENT', b''.join(response.streaming_content).decode())
+        User.objects.filter(pk=self.lawyer.pk).update(feed_token_version=5)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class InvoiceRollupTest(APITestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='billclient', email='billclient@example.com', password='testpass', role='client')
+        self.other_client = User.objects.create_user(username='billother', email='billother@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('billlawyer')
+        self.case = Case.objects.create(title='Billing', description='d', type='civil', client=self.client_user, lawyer=self.lawyer)
+        self.invoices = [
+            Invoice.objects.create(case=self.case, amount=amount, client=client, lawyer=self.lawyer)
+            for amount, client in ((100, self.client_user), (250, self.client_user), (40, self.other_client))
+        ]
+
+    def rollup_rows(self):
+        return sorted(InvoiceRollup.objects.exclude(count=0).values_list('client_id', 'status', 'count', 'total'))
+
+    def test_rollups_follow_status_changes_and_deletes(self):
+        invoice = self.invoices[0]
+        invoice.status = 'paid'
+        invoice.save()
+        Invoice.objects.get(pk=self.invoices[1].pk).delete()
+        incremental = self.rollup_rows()
+        self.assertEqual(incremental, sorted([
+            (self.client_user.id, 'paid', 1, 100), (self.other_client.id, 'pending', 1, 40),
+        ]))
+        call_command('rebuild_invoice_rollups', stdout=StringIO())
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_summary_reads_rollups_scoped_to_the_caller(self):
+        self.invoices[1].status = 'paid'
+        self.invoices[1].save()
+        self.client.force_authenticate(self.client_user)
+        with self.assertNumQueries(5):
+            response = self.client.get('/law/invoices/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total'], {'count': 2, 'amount': 350})
+        self.assertEqual([(row['status'], row['amount']) for row in response.data['by_status']], [('paid', 250), ('pending', 100)])
+        self.assertEqual(len(response.data['by_month']), 1)
+        self.assertEqual([row['lawyer__username'] for row in response.data['by_lawyer']], ['billlawyer'])
+
+        self.client.force_authenticate(self.lawyer)
+        response = self.client.get('/law/invoices/summary/', {'client': self.other_client.id})
+        self.assertEqual(response.data['total'], {'count': 1, 'amount': 40})
+
+
+class InvoiceImportExportTest(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='finance', email='finance@example.com', password='testpass', role='client', is_staff=True)
+        self.client_user = User.objects.create_user(username='importclient', email='importclient@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('importlawyer', per_case_charge=100)
+        self.case = Case.objects.create(title='Import', description='d', type='civil', client=self.client_user, lawyer=self.lawyer)
+        self.client.force_authenticate(self.staff)
+
+    def csv_body(self, rows):
+        return 'case,amount,status\n' + ''.join(f'{case},{amount},{status}\n' for case, amount, status in rows)
+
+    @override_settings(INVOICE_IMPORT_CHUNK_SIZE=50)
+    def test_csv_import_costs_a_fixed_number_of_queries_per_chunk(self):
+        rows = [(self.case.id, 50 + i, '') for i in range(100)]
+        with self.captureOnCommitCallbacks(execute=False):
+            with self.assertNumQueries(2 * 9):
+                response = self.client.post('/law/invoices/import/', self.csv_body(rows), content_type='text/csv')
+        self.assertEqual(response.data, {'created': 100, 'skipped': 0, 'error_count': 0, 'errors': []})
+        self.assertEqual(Invoice.objects.filter(client=self.client_user, lawyer=self.lawyer).count(), 100)
+        # Amounts at or above the lawyer's per-case charge count as paid.
+        self.assertEqual(Invoice.objects.filter(status='paid').count(), 50)
+        self.assertEqual(sum(InvoiceRollup.objects.values_list('count', flat=True)), 100)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        body = self.csv_body([(self.case.id, '10.00', 'paid'), (999999, '5', ''), (self.case.id, '-1', ''), (self.case.id, '3', 'lost')])
+        response = self.client.post('/law/invoices/import/', body, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([(error['row'], sorted(error['errors'])) for error in response.data['errors']],
+                         [(2, ['case', 'client', 'lawyer']), (3, ['amount']), (4, ['status'])])
+
+    def test_rows_must_match_the_case_parties(self):
+        other = make_lawyer('otherlawyer')
+        body = (f'case,client,lawyer,amount\n{self.case.id},{self.staff.id},,10\n'
+                f'{self.case.id},,{other.id},10\n{self.case.id},{self.client_user.id},{self.lawyer.id},10\n')
+        response = self.client.post('/law/invoices/import/', body, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual([(error['row'], error['errors']) for error in response.data['errors']],
+                         [(1, {'client': 'Does not match the case.'}), (2, {'lawyer': 'Does not match the case.'})])
+
+    def test_import_is_staff_only(self):
+        self.client.force_authenticate(self.client_user)
+        response = self.client.post('/law/invoices/import/', self.csv_body([]), content_type='text/csv')
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_round_trips_through_the_command(self):
+        for amount in (120, 80):
+            Invoice.objects.create(case=self.case, amount=amount, client=self.client_user, lawyer=self.lawyer)
+        response = self.client.get('/law/invoices/export/', {'output': 'ndjson'})
+        self.assertTrue(response.streaming)
+        exported = b''.join(response.streaming_content)
+        self.assertEqual([json.loads(line)['amount'] for line in exported.splitlines()], ['120.00', '80.00'])
+
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as fh:
+            fh.write(exported)
+            fh.flush()
+            out = StringIO()
+            call_command('import_invoices', fh.name, '--no-notify', stdout=out)
+        self.assertIn('Imported 0 invoices; skipped 2 existing', out.getvalue())
+        self.assertEqual(Invoice.objects.filter(amount=120).count(), 1)
+
+        # Into an empty table the same file restores ids, dates and rollups.
+        originals = list(Invoice.objects.order_by('id').values_list('id', 'created_at', 'amount', 'status'))
+        Invoice.objects.all().delete()
+        with tempfile.NamedTemporaryFile(suffix='.ndjson') as fh:
+            fh.write(exported)
+            fh.flush()
+            out = StringIO()
+            call_command('import_invoices', fh.name, '--no-notify', stdout=out)
+        self.assertIn('Imported 2 invoices', out.getvalue())
+        self.assertEqual(list(Invoice.objects.order_by('id').values_list('id', 'created_at', 'amount', 'status')), originals)
+        self.assertEqual(sum(InvoiceRollup.objects.values_list('count', flat=True)), 2)
+
+        self.client.force_authenticate(self.client_user)
+        response = self.client.get('/law/invoices/export/')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,case,client,lawyer,amount,status,created_at,due_date,paid_at,description')
+        self.assertEqual(len(lines), 3)
+
+
+@override_settings(NOTIFICATION_DELIVERY='sync')
+class OverdueSweepTest(TestCase):
+    def setUp(self):
+        self.clients = [User.objects.create_user(username=f'dueclient{i}', email=f'dueclient{i}@example.com', password='testpass', role='client')
+                        for i in range(2)]
+        self.lawyer = make_lawyer('duelawyer')
+        case = Case.objects.create(title='Due', description='d', type='civil', client=self.clients[0], lawyer=self.lawyer)
+        today = timezone.localdate()
+        for client, due, status in ((0, -3, 'pending'), (0, -1, 'pending'), (1, -2, 'pending'),
+                                    (1, -5, 'paid'), (1, 4, 'pending'), (0, 0, 'pending')):
+            Invoice.objects.create(case=case, amount=10, client=self.clients[client], lawyer=self.lawyer,
+                                   status=status, due_date=today + timedelta(days=due))
+
+    def test_sweeps_late_pending_invoices_in_batches(self):
+        out = StringIO()
+        call_command('sweep_overdue_invoices', batch_size=2, stdout=out)
+        self.assertIn('Marked 3 invoices overdue in 2 batches; notified 3 users.', out.getvalue())
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 3)
+        self.assertEqual(Invoice.objects.filter(status='pending').count(), 2)
+        self.assertEqual(InvoiceRollup.objects.get(status='overdue', client=self.clients[0]).count, 2)
+
+        # One notification per user per batch, sent as the batch commits.
+        last = Invoice.objects.filter(status='overdue').order_by('due_date', 'id').last()
+        contents = sorted(self.lawyer.notifications.values_list('content', flat=True))
+        self.assertEqual(contents, ['2 invoices are now overdue.', f'Invoice #{last.id} is now overdue.'])
+        self.assertEqual(self.clients[1].notifications.get().content,
+                         f"Invoice #{Invoice.objects.get(status='overdue', client=self.clients[1]).id} is now overdue.")
+
+    def test_failed_batch_keeps_the_batches_before_it(self):
+        batches = []
+
+        def move_then_fail(rows, status):
+            batches.append(rows)
+            if len(batches) == 2:
+                raise RuntimeError('disk full')
+            move_invoices(rows, status)
+
+        with mock.patch('apps.cases.management.commands.sweep_overdue_invoices.move_invoices', move_then_fail):
+            with self.assertRaises(RuntimeError):
+                call_command('sweep_overdue_invoices', batch_size=2, stdout=StringIO())
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 2)
+        self.assertEqual(list(self.lawyer.notifications.values_list('content', flat=True)), ['2 invoices are now overdue.'])
+
+    def test_rerun_finds_nothing_new(self):
+        call_command('sweep_overdue_invoices', stdout=StringIO())
+        out = StringIO()
+        call_command('sweep_overdue_invoices', stdout=out)
+        self.assertIn('Marked 0 invoices overdue', out.getvalue())
+
+    def test_new_invoices_get_payment_terms(self):
+        invoice = Invoice.objects.filter(status='pending').first()
+        fresh = Invoice.objects.create(case=invoice.case, amount=5, client=invoice.client, lawyer=self.lawyer)
+        self.assertEqual(fresh.due_date, timezone.localdate() + timedelta(days=settings.INVOICE_PAYMENT_TERMS_DAYS))
+
+
+class OverdueSweepRaceTest(TransactionTestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='raceclientdue', email='raceclientdue@example.com',
+                                                    password='testpass', role='client')
+        self.lawyer = make_lawyer('racelawyerdue')
+        case = Case.objects.create(title='Due', description='d', type='civil', client=self.client_user, lawyer=self.lawyer)
+        today = timezone.localdate()
+        for i in range(30):
+            Invoice.objects.create(case=case, amount=10, client=self.client_user, lawyer=self.lawyer,
+                                   due_date=today - timedelta(days=1 + i % 5))
+
+    def test_overlapping_sweeps_split_the_work(self):
+        barrier = threading.Barrier(2)
+        outputs, errors = [], []
+
+        def sweep():
+            out = StringIO()
+            try:
+                barrier.wait()
+                call_command('sweep_overdue_invoices', batch_size=4, stdout=out)
+                outputs.append(out.getvalue())
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        with override_settings(NOTIFICATION_DELIVERY='sync'):
+            workers = [threading.Thread(target=sweep) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        self.assertEqual(errors, [])
+        marked = sum(int(output.split()[1]) for output in outputs)
+        self.assertEqual(marked, 30)
+        self.assertEqual(Invoice.objects.filter(status='overdue').count(), 30)
+        self.assertEqual(InvoiceRollup.objects.get(status='overdue').count, 30)
+        self.assertEqual(InvoiceRollup.objects.get(status='pending').count, 0)
+        # Every invoice is reported to the client exactly once across both runs.
+        reported = 0
+        for content in self.client_user.notifications.values_list('content', flat=True):
+            reported += 1 if content.startswith('Invoice #') else int(content.split()[0])
+        self.assertEqual(reported, 30)
+
+
+class DashboardTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.client_user = User.objects.create_user(username='dashclient', email='dashclient@example.com', password='testpass', role='client')
+        self.lawyer = make_lawyer('dashlawyer')
+        self.case = Case.objects.create(title='Open', description='d', type='civil', client=self.client_user)
+        Case.objects.create(title='Mine', description='d', type='civil', client=self.client_user, lawyer=self.lawyer, status='in_review')
+        CaseRequest.objects.create(client=self.client_user, lawyer=self.lawyer, title='Help', description='d')
+        now = timezone.now()
+        for hours, status in ((-2, 'confirmed'), (1, 'cancelled'), (3, 'pending'), (5, 'confirmed')):
+            Appointment.objects.create(title=f'At {hours}', client=self.client_user, lawyer=self.lawyer, status=status,
+                                       start_time=now + timedelta(hours=hours), end_time=now + timedelta(hours=hours, minutes=30))
+        Invoice.objects.create(case=self.case, amount=70, client=self.client_user, lawyer=self.lawyer)
+        Invoice.objects.create(case=self.case, amount=30, client=self.client_user, lawyer=self.lawyer, status='paid')
+        self.client.force_authenticate(self.client_user)
+
+    def test_summary_is_built_from_aggregates_and_cached(self):
+        with self.assertNumQueries(5):
+            response = self.client.get('/law/dashboard/')
+        data = response.data
+        self.assertEqual(data['cases'], {'open': 1, 'in_review': 1, 'closed': 0})
+        self.assertEqual(data['case_requests'], {'pending_received': 0, 'pending_sent': 1})
+        self.assertEqual(data['appointments']['upcoming_count'], 2)
+        self.assertEqual([row['title'] for row in data['appointments']['next']], ['At 3', 'At 5'])
+        self.assertEqual(data['invoices']['payable']['pending'], {'count': 1, 'amount': 70})
+        self.assertEqual(data['invoices']['receivable']['pending']['count'], 0)
+        with self.assertNumQueries(0):
+            self.client.get('/law/dashboard/')
+
+    def test_changes_invalidate_both_participants(self):
+        self.client.get('/law/dashboard/')
+        self.client.force_authenticate(self.lawyer)
+        self.client.get('/law/dashboard/')
+        CaseRequest.objects.update(status='accepted')
+        CaseRequest.objects.create(client=self.client_user, lawyer=self.lawyer, title='More', description='d')
+        self.assertEqual(self.client.get('/law/dashboard/').data['case_requests']['pending_received'], 1)
+        self.client.force_authenticate(self.client_user)
+        self.assertEqual(self.client.get('/law/dashboard/').data['case_requests']['pending_sent'], 1)
+
+
+class ThreadHistoryTest(APITestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user(username='histalice', email='histalice@example.com', password='testpass', role='client')
+        self.bob = User.objects.create_user(username='histbob', email='histbob@example.com', password='testpass', role='client')
+        case = Case.objects.create(title='History', description='d', type='civil', client=self.alice)
+        self.threads = []
+        for i in range(3):
+            thread = Thread.objects.create(case=case)
+            thread.participants.set([self.alice, self.bob])
+            self.threads.append(thread)
+        self.thread = self.threads[0]
+        Message.objects.bulk_create([
+            Message(thread=self.thread, case=case, content=f'msg {i}', sender=self.bob, receiver=self.alice, is_read=i < 7)
+            for i in range(12)
+        ])
+        # Shared timestamps force the id tie-breaker to do its job.
+        for i, message in enumerate(Message.objects.order_by('id')):
+            Message.objects.filter(pk=message.pk).update(created_at=timezone.now() - timedelta(minutes=10 - i // 3))
+        self.client.force_authenticate(self.alice)
+
+    def test_history_pages_backwards_without_gaps(self):
+        url = f'/law/threads/{self.thread.id}/messages/?limit=5'
+        contents = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            contents = [row['content'] for row in response.data['results']] + contents
+            cursor = response.data['next_before']
+            url = f'/law/threads/{self.thread.id}/messages/?limit=5&before={cursor}' if cursor else None
+        self.assertEqual(contents, [f'msg {i}' for i in range(12)])
+
+    def test_thread_list_carries_unread_and_preview_in_one_query(self):
+        # One aggregate query for the threads plus the participants prefetch.
+        with self.assertNumQueries(2):
+            response = self.client.get('/law/threads/')
+        rows = {row['id']: row for row in response.data['results']}
+        self.assertEqual(rows[self.thread.id]['unread_count'], 5)
+        self.assertEqual(rows[self.thread.id]['last_message']['content'], 'msg 11')
+        self.assertEqual(rows[self.threads[1].id]['unread_count'], 0)
+        self.assertIsNone(rows[self.threads[1].id]['last_message'])
+
+    def test_non_participants_cannot_read_history(self):
+        outsider = User.objects.create_user(username='histout', email='histout@example.com', password='testpass', role='client')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get(f'/law/threads/{self.thread.id}/messages/').status_code, 404)
+
+    def test_message_list_is_limited_to_own_threads(self):
+        response = self.client.get('/law/messages/')
+        self.assertEqual(len(response.data['results']), 12)
+        outsider = User.objects.create_user(username='msgout', email='msgout@example.com', password='testpass', role='client')
+        self.client.force_authenticate(outsider)
+        self.assertEqual(self.client.get('/law/messages/').data['results'], [])
+        message = Message.objects.filter(thread=self.thread).first()
+        self.assertEqual(self.client.get(f'/law/messages/{message.id}/').status_code, 404)
+        response = self.client.post('/law/messages/', {
+            'thread': self.thread.id, 'case': self.thread.case_id, 'receiver': self.alice.id, 'content': 'hi',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('thread', response.data)
+
+    def test_history_query_uses_thread_index(self):
+        created_at, message_id = timezone.now(), 10
+        plan = (Message.objects.filter(thread=self.thread, created_at__lte=created_at)
+                .exclude(created_at=created_at, id__gte=message_id).order_by('-created_at', '-id')[:51].explain())
+        self.assertIn('message_thread_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
@@ -0,0 +1,43 @@
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+from .files import SNIFF_BYTES, sniff_content_type
+
+
+class DigestMixin:
+    """Hash and sniff uploaded files while the request body streams in.
+
+    The resulting ``UploadedFile`` carries ``sha256`` and
+    ``sniffed_content_type`` so saving a ``Document`` never has to read the
+    file a second time.
+    """
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        self.head = b''
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # The memory handler passes chunks through untouched when the upload
+        # is too large for it; only the handler that keeps the data hashes it.
+        if getattr(self, 'activated', True):
+            self.sha256.update(raw_data)
+            if len(self.head) < SNIFF_BYTES:
+                self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        upload = super().file_complete(file_size)
+        if upload is not None:
+            upload.sha256 = self.sha256.hexdigest()
+            upload.sniffed_content_type = sniff_content_type(self.head, upload.name)
+        return upload
+
+
+class DigestMemoryFileUploadHandler(DigestMixin, MemoryFileUploadHandler):
+    pass
+
+
+class DigestTemporaryFileUploadHandler(DigestMixin, TemporaryFileUploadHandler):
+    pass
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .files import scan_file
+from .models import Document, UploadSession
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    """A chunk was rejected; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class AssembledFile(File):
+    """Lets storage move the finished part file into place instead of copying it."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def stage_chunk(session, stream, length, checksum):
+    """Copy ``length`` bytes of ``stream`` into a file of their own.
+
+    The chunk is hashed while it is written; the staging file is removed and
+    the chunk rejected if it is short or does not match ``checksum``.
+    """
+    digest = hashlib.sha256()
+    staged = tempfile.NamedTemporaryFile(dir=settings.UPLOAD_SESSION_DIR, prefix=f'{session.id}.',
+                                         suffix='.chunk', delete=False)
+    with staged:
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            staged.write(data)
+            remaining -= len(data)
+    if remaining or digest.hexdigest() != checksum.lower():
+        os.remove(staged.name)
+        raise ChunkError("Chunk is incomplete or does not match its checksum.")
+    return staged.name
+
+
+def write_chunk(session, stream, offset, length, checksum):
+    """Append ``length`` bytes read from ``stream`` at ``offset``.
+
+    The chunk is verified in a staging file and only copied into the part
+    file once it has claimed ``offset``, so a rejected or losing request
+    never touches bytes another request already committed. Returns the new
+    offset.
+    """
+    if offset != session.offset:
+        raise ChunkError(f"Expected offset {session.offset}.", status=409)
+    end = offset + length
+    if end > session.total_size:
+        raise ChunkError("Chunk runs past the declared size.")
+    if length != session.chunk_size and end != session.total_size:
+        raise ChunkError(f"Chunks must be {session.chunk_size} bytes except the last one.")
+
+    staged = stage_chunk(session, stream, length, checksum)
+    try:
+        with transaction.atomic():
+            # Only one writer can move the session past this offset. The
+            # claim holds the session row until the copy below is done, and
+            # is undone with the transaction if the copy fails.
+            claimed = (UploadSession.objects.filter(pk=session.pk, offset=offset)
+                       .update(offset=end, updated_at=timezone.now()))
+            if not claimed:
+                session.refresh_from_db(fields=['offset'])
+                raise ChunkError("Another chunk was written at this offset.", status=409)
+            with open(staged, 'rb') as chunk, open(session.part_path, 'r+b') as part:
+                part.seek(offset)
+                shutil.copyfileobj(chunk, part, READ_SIZE)
+    finally:
+        os.remove(staged)
+    session.offset = end
+    return end
+
+
+def assemble(session):
+    """Turn a fully received session into a ``Document``.
+
+    The session is claimed first so only one request assembles it; the
+    others get a 409. The part file is then read once, in chunks, to checksum
+    and sniff it, and moved into storage rather than copied where the backend
+    allows it.
+    """
+    with transaction.atomic():
+        # The claim also waits out a last chunk that has claimed its offset
+        # but is still being copied in.
+        claimed = (UploadSession.objects.filter(pk=session.pk, offset=F('total_size'), completing=False)
+                   .update(completing=True, updated_at=timezone.now()))
+    if not claimed:
+        try:
+            session.refresh_from_db(fields=['offset', 'completing'])
+        except UploadSession.DoesNotExist:
+            raise ChunkError("Upload was already completed.", status=409)
+        if session.completing:
+            raise ChunkError("Upload is already being completed.", status=409)
+        raise ChunkError(f"Upload is incomplete: {session.offset} of {session.total_size} bytes received.", status=409)
+
+    try:
+        return build_document(session)
+    except Exception:
+        # Let the owner fix the upload and try again.
+        UploadSession.objects.filter(pk=session.pk).update(completing=False)
+        raise
+
+
+def build_document(session):
+    """Check the claimed part file and store it as a ``Document``."""
+    size = os.path.getsize(session.part_path)
+    if size != session.total_size:
+        raise ChunkError(f"Part file holds {size} of {session.total_size} bytes; upload it again.", status=409)
+
+    with open(session.part_path, 'rb') as part:
+        size, sha256, content_type = scan_file(part, session.name)
+    if session.sha256 and session.sha256.lower() != sha256:
+        raise ChunkError("Assembled file does not match the declared checksum.")
+
+    document = Document(name=session.name, owner=session.owner, folder=session.folder,
+                        size=size, sha256=sha256, content_type=content_type)
+    with transaction.atomic():
+        with open(session.part_path, 'rb') as part:
+            document.file.save(session.name, AssembledFile(part, name=session.part_path), save=False)
+        document.save()
+        session.discard()
+    return document
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import AcceptCase, CaseRequestViewSet, CaseViewSet, CaseUpdateViewSet, AppointmentViewSet, DocumentViewSet, FolderViewSet, MessageViewSet, InvoiceViewSet, ThreadViewSet, download_file
+from .views import AcceptCase, DashboardView, CaseRequestViewSet, CaseViewSet, CaseUpdateViewSet, AppointmentViewSet, DocumentViewSet, FolderViewSet, MessageViewSet, InvoiceViewSet, ThreadViewSet, UploadSessionViewSet, appointment_feed, download_file
 
 router = DefaultRouter()
 router.register(r'cases', CaseViewSet)
@@ -8,6 +8,7 @@ router.register(r'case-updates', CaseUpdateViewSet)
 router.register(r'appointments', AppointmentViewSet)
 router.register(r'documents', DocumentViewSet, basename='document')
 router.register(r'folders', FolderViewSet, basename='folder')
+router.register(r'uploads', UploadSessionViewSet, basename='upload')
 router.register(r'threads', ThreadViewSet)
 router.register(r'messages', MessageViewSet)
 router.register(r'invoices', InvoiceViewSet)
@@ -15,8 +16,10 @@ router.register('case-requests', CaseRequestViewSet, basename='case-request')
 
 
 urlpatterns = [
+    path('appointments/feed/<str:token>.ics', appointment_feed, name='appointment-feed'),
     path('', include(router.urls)),
     #path('messages/receiver/<int:receiver_id>/', MessageViewSet.as_view(), name='messages_for_receiver'),
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
     path('cases/<int:case_id>/accept/', AcceptCase.as_view(), name='accept-case'),
     path('api/download/<int:pk>/', download_file, name='download_file'),
 ]
@@ -1,22 +1,42 @@
-from django.http import JsonResponse
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.db import transaction
+from django.db.models import Count, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, Substr
 from rest_framework import viewsets
 
 
 from apps.users.models import LawyerProfile, User
 from apps.notifications.signals import create_notification
-from .models import Case, CaseUpdate, Appointment, Document, Message, Invoice
+from .models import Case, CaseUpdate, Appointment, Document, Message, Invoice, InvoiceRollup
 from .serializers import CaseSerializer, CaseUpdateSerializer, AppointmentSerializer, DocumentSerializer, MessageSerializer, InvoiceSerializer
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
+
+from .availability import NON_BLOCKING_STATUSES, free_slots, has_conflict, lock_calendar
+from .cache import invalidate_dashboards
+from .calendar import (feed_etag, feed_queryset, feed_state, feed_token, feed_token_is_current, iter_calendar,
+                       read_feed_token, rotate_feed_token)
+from .dashboard import get_dashboard
+from .filters import ListFilterBackend
+from .invoice_io import CONTENT_TYPES, FORMATS, InvoiceImporter, iter_export, read_records
+from .pagination import CreatedAtCursorPagination, decode_keyset, encode_keyset
 class CaseViewSet(viewsets.ModelViewSet):
     queryset = Case.objects.all()
     serializer_class = CaseSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
     def perform_create(self, serializer):
         message = serializer.save(client=self.request.user)
         # Create notification for recipient
@@ -33,6 +53,8 @@ class CaseUpdateViewSet(viewsets.ModelViewSet):
     queryset = CaseUpdate.objects.all()
     serializer_class = CaseUpdateSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
     def perform_create(self, serializer):
         message = serializer.save(sender=self.request.user)
         # Create notification for recipient
@@ -49,29 +71,100 @@ class AppointmentViewSet(viewsets.ModelViewSet):
     queryset = Appointment.objects.all()
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+    cursor_ordering = ('-start_time', '-id')
+    date_field = 'start_time'
+
+    def save_without_overlap(self, serializer):
+        data = serializer.validated_data
+        instance = serializer.instance
+        lawyer = data.get('lawyer', getattr(instance, 'lawyer', None))
+        start = data.get('start_time', getattr(instance, 'start_time', None))
+        end = data.get('end_time', getattr(instance, 'end_time', None))
+        status_value = data.get('status', getattr(instance, 'status', None))
+        with transaction.atomic():
+            # Two overlapping requests cannot both pass the check.
+            lock_calendar(lawyer.pk)
+            if status_value not in NON_BLOCKING_STATUSES and has_conflict(
+                    lawyer.pk, start, end, exclude_pk=getattr(instance, 'pk', None)):
+                raise ValidationError({'start_time': "The lawyer already has an appointment in this time."})
+            return serializer.save()
+
+    def perform_update(self, serializer):
+        self.save_without_overlap(serializer)
+
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """Free time for ``?lawyer=`` between ``?start=`` and ``?end=``.
+
+        ``?min_minutes=`` drops gaps shorter than that.
+        """
+        params = request.query_params
+        lawyer = params.get('lawyer', '')
+        if not lawyer.isdigit():
+            raise ValidationError({'lawyer': 'Must be a user id.'})
+        start = ListFilterBackend._parse(params, 'start')
+        end = ListFilterBackend._parse(params, 'end')
+        if start is None or end is None or end <= start:
+            raise ValidationError({'end': 'Provide start and a later end.'})
+        if end - start > settings.AVAILABILITY_MAX_RANGE:
+            raise ValidationError({'end': f'Ranges are limited to {settings.AVAILABILITY_MAX_RANGE.days} days.'})
+        min_minutes = params.get('min_minutes', '0')
+        if not min_minutes.isdigit():
+            raise ValidationError({'min_minutes': 'Must be a number of minutes.'})
+
+        slots = free_slots(int(lawyer), start, end, timedelta(minutes=int(min_minutes)))
+        return Response({
+            'lawyer': int(lawyer),
+            'start': start,
+            'end': end,
+            'free': [{'start': slot_start, 'end': slot_end} for slot_start, slot_end in slots],
+        })
+
+    @action(detail=False, methods=['get', 'post'], url_path='feed-url')
+    def feed_url(self, request):
+        """Private iCalendar subscription URL for the current user.
+
+        ``POST`` rotates it: every URL handed out before stops working.
+        """
+        token = rotate_feed_token(request.user) if request.method == 'POST' else feed_token(request.user)
+        path = reverse('appointment-feed', args=[token])
+        return Response({'url': request.build_absolute_uri(path)})
+
     def perform_create(self, serializer):
-        appointment = serializer.save()
-        
-        create_notification(
-            user=self.request.user,  # ✅ Use the currently authenticated user
-            notif_type='appointment',
-            title='New Appointment',
-            content=f"Appointment scheduled for {appointment.end_time}",  # or whatever your actual field name is
-            related_id=appointment.id
-        )
+        # One transaction, so the notification write happens under the
+        # calendar lock instead of competing for it afterwards.
+        with transaction.atomic():
+            appointment = self.save_without_overlap(serializer)
 
+            create_notification(
+                user=self.request.user,  # ✅ Use the currently authenticated user
+                notif_type='appointment',
+                title='New Appointment',
+                content=f"Appointment scheduled for {appointment.end_time}",  # or whatever your actual field name is
+                related_id=appointment.id
+            )
 
-from rest_framework import viewsets, permissions
-from .models import Document, Folder
-from .serializers import DocumentSerializer, FolderSerializer
+
+import os
+
+from django.conf import settings
+from rest_framework import mixins, viewsets, permissions
+from .models import Document, Folder, UploadSession
+from .serializers import DocumentSerializer, FolderSerializer, UploadSessionSerializer
+from .uploads import ChunkError, assemble, write_chunk
 
 class FolderViewSet(viewsets.ModelViewSet):
     queryset = Folder.objects.all() 
     serializer_class = FolderSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+    cursor_ordering = ('-id',)
 
     def get_queryset(self):
-        return Folder.objects.filter(owner=self.request.user)
+        return Folder.objects.filter(owner=self.request.user).annotate(document_count=Count('document'))
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
@@ -80,23 +173,114 @@ class DocumentViewSet(viewsets.ModelViewSet):
     queryset = Document.objects.all()  
     serializer_class = DocumentSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+    cursor_ordering = ('-uploaded_at', '-id')
+    date_field = 'uploaded_at'
+    sort_orderings = {
+        'uploaded_at': ('uploaded_at', 'id'),
+        '-uploaded_at': ('-uploaded_at', '-id'),
+        'size': ('size', 'id'),
+        '-size': ('-size', '-id'),
+    }
 
     def get_queryset(self):
-        return Document.objects.filter(owner=self.request.user)
+        queryset = Document.objects.filter(owner=self.request.user)
+        if self.request.query_params.get('sort') in ('size', '-size'):
+            # Rows the metadata backfill has not reached yet cannot be keyset-paged by size.
+            queryset = queryset.filter(size__isnull=False)
+        return queryset
+
+    def get_cursor_ordering(self):
+        return self.sort_orderings.get(self.request.query_params.get('sort'), self.cursor_ordering)
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+class UploadSessionViewSet(mixins.CreateModelMixin,
+                           mixins.RetrieveModelMixin,
+                           mixins.DestroyModelMixin,
+                           viewsets.GenericViewSet):
+    """Resumable, chunked document uploads.
+
+    ``POST /uploads/`` opens a session; each chunk is ``PUT`` raw to
+    ``/uploads/{id}/chunk/`` with ``Upload-Offset`` and ``Upload-Checksum``
+    (hex SHA-256 of the chunk) headers; ``GET /uploads/{id}/`` reports the
+    offset to resume from; ``POST /uploads/{id}/complete/`` creates the
+    ``Document``.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(owner=self.request.user)
+
+    def perform_create(self, serializer):
+        session = serializer.save(owner=self.request.user, chunk_size=settings.UPLOAD_CHUNK_SIZE)
+        os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+        open(session.part_path, 'wb').close()
+
+    def perform_destroy(self, instance):
+        instance.discard()
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        session = self.get_object()
+        offset = request.META.get('HTTP_UPLOAD_OFFSET', '')
+        checksum = request.META.get('HTTP_UPLOAD_CHECKSUM', '')
+        length = request.META.get('CONTENT_LENGTH', '')
+        if not (offset.isdigit() and length.isdigit() and checksum):
+            return Response({'error': 'Upload-Offset, Upload-Checksum and Content-Length are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # Read the raw body straight off the socket; request.data would buffer it.
+            new_offset = write_chunk(session, request._request, int(offset), int(length), checksum)
+        except ChunkError as exc:
+            return Response({'error': str(exc), 'offset': session.offset}, status=exc.status)
+        return Response({'offset': new_offset})
+
+    @action(detail=True, methods=['post'])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        try:
+            document = assemble(session)
+        except ChunkError as exc:
+            return Response({'error': str(exc), 'offset': session.offset}, status=exc.status)
+        return Response(DocumentSerializer(document, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
+
+
 # views.py
-from django.http import FileResponse
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 
+from .downloads import serve_document
+
+def appointment_feed(request, token):
+    """Stream the iCalendar feed signed into ``token``; no login required."""
+    signed = read_feed_token(token)
+    if signed is None:
+        raise Http404
+    appointments = feed_queryset(*signed)
+    state = feed_state(appointments)
+    # An empty feed may just be a revoked token; only then is it worth a look.
+    if not state['count'] and not feed_token_is_current(*signed):
+        raise Http404
+    etag = feed_etag(state)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = StreamingHttpResponse(iter_calendar(appointments, request.get_host()),
+                                         content_type='text/calendar; charset=utf-8')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def download_file(request, pk):
-    doc = Document.objects.get(pk=pk, owner=request.user)
-    return FileResponse(doc.file.open(), as_attachment=True)
+    doc = get_object_or_404(Document, pk=pk, owner=request.user)
+    return serve_document(request, doc)
 
 
 
@@ -115,98 +299,229 @@ class ThreadViewSet(viewsets.ModelViewSet):
     queryset = Thread.objects.all()
     serializer_class = ThreadSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+    message_page_size = 50
+    max_message_page_size = 200
 
-    def perform_create(self, serializer):
-        participants = self.request.data.get('participants')
-        if participants:
-            user1 = self.request.user
-            user2 = User.objects.get(id=participants[0])
-            thread = Thread.get_or_create_thread(user1, user2)
-            serializer.save()
-        else:
-            # Handle error: participants not provided
-            pass
+    def get_queryset(self):
+        """The user's threads with unread counts and a last-message preview, in one query."""
+        user = self.request.user
+        latest = Message.objects.filter(thread=OuterRef('pk')).order_by('-created_at', '-id')
+        unread = (
+            Message.objects.filter(thread=OuterRef('pk'), receiver=user, is_read=False)
+            .values('thread').annotate(total=Count('id')).values('total')
+        )
+        return (
+            Thread.objects.filter(participants=user)
+            .annotate(
+                unread_count=Coalesce(Subquery(unread), 0),
+                last_message_id=Subquery(latest.values('id')[:1]),
+                last_message_preview=Subquery(latest.annotate(preview=Substr('content', 1, 140)).values('preview')[:1]),
+                last_message_sender=Subquery(latest.values('sender_id')[:1]),
+                last_message_at=Subquery(latest.values('created_at')[:1]),
+            )
+            .prefetch_related('participants')
+        )
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, pk=None):
+        """Page backwards through a thread: ``?before=<cursor>&limit=N``.
+
+        Results are oldest-first within the page; ``next_before`` fetches the
+        page of older messages.
+        """
+        thread = self.get_object()
+        limit = request.query_params.get('limit', str(self.message_page_size))
+        if not limit.isdigit() or int(limit) < 1:
+            return Response({'error': 'limit must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(int(limit), self.max_message_page_size)
+
+        messages = Message.objects.filter(thread=thread).select_related('sender').order_by('-created_at', '-id')
+        before = request.query_params.get('before')
+        if before:
+            created_at, message_id = decode_keyset(before)
+            # A range on (thread, created_at) with the id tie-break applied inside it.
+            messages = messages.filter(created_at__lte=created_at).exclude(created_at=created_at, id__gte=message_id)
+
+        page = list(messages[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        oldest = page[-1] if page else None
+        return Response({
+            'results': MessageSerializer(reversed(page), many=True).data,
+            'next_before': encode_keyset(oldest.created_at, oldest.id) if has_more else None,
+        })
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     queryset = Message.objects.all()
+    permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+
+    def get_queryset(self):
+        """Messages in threads the user takes part in."""
+        return Message.objects.filter(thread__participants=self.request.user)
 
     def perform_create(self, serializer):
+        if not serializer.validated_data['thread'].participants.filter(pk=self.request.user.pk).exists():
+            raise ValidationError({'thread': 'You are not part of this thread.'})
         serializer.save(sender=self.request.user)
 
 class InvoiceViewSet(viewsets.ModelViewSet):
     queryset = Invoice.objects.all()
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
+    summary_groupings = {
+        'by_status': ('status',),
+        'by_month': ('month',),
+        'by_lawyer': ('lawyer_id', 'lawyer__username'),
+        'by_client': ('client_id', 'client__username'),
+    }
+
+    @action(detail=False, methods=['get'])
+    def summary(self, request):
+        """Invoice totals from the rollup table, scoped to the caller.
+
+        Staff see everyone's invoices; other users see those they issued or
+        received. ``?lawyer=``/``?client=`` narrow further and
+        ``?from=``/``?to=`` bound the month range.
+        """
+        rollups = InvoiceRollup.objects.all()
+        if not request.user.is_staff:
+            rollups = rollups.filter(Q(lawyer=request.user) | Q(client=request.user))
+        params = request.query_params
+        for name in ('lawyer', 'client'):
+            value = params.get(name)
+            if value:
+                if not value.isdigit():
+                    raise ValidationError({name: 'Must be a user id.'})
+                rollups = rollups.filter(**{f'{name}_id': int(value)})
+        for name, lookup in (('from', 'month__gte'), ('to', 'month__lte')):
+            moment = ListFilterBackend._parse(params, name)
+            if moment is not None:
+                rollups = rollups.filter(**{lookup: moment.date().replace(day=1)})
+
+        rollups = rollups.exclude(count=0)
+        summary = {'total': rollups.aggregate(count=Coalesce(Sum('count'), 0), amount=Coalesce(Sum('total'), Decimal(0)))}
+        for name, fields in self.summary_groupings.items():
+            summary[name] = list(rollups.values(*fields).annotate(count=Sum('count'), amount=Sum('total'))
+                                 .order_by(*fields))
+        return Response(summary)
     
+    @action(detail=False, methods=['post'], url_path='import', permission_classes=[IsAdminUser])
+    def import_invoices(self, request):
+        """Bulk-load invoices from CSV or NDJSON.
+
+        Send a multipart ``file`` (``.csv``, ``.ndjson`` or ``.jsonl``) or the
+        raw body as ``text/csv`` or ``application/x-ndjson``. Rows are read
+        and inserted in chunks; invalid rows are skipped and reported by record number,
+        and rows whose ``id`` already exists are counted as ``skipped``.
+        """
+        content_type = request.content_type.split(';')[0].strip()
+        if content_type == 'multipart/form-data':
+            upload = request.FILES.get('file')
+            if upload is None:
+                raise ValidationError({'file': 'Required.'})
+            fmt = 'csv' if upload.name.lower().endswith('.csv') else 'ndjson'
+            lines = upload
+        elif content_type in ('text/csv', 'application/x-ndjson', 'application/jsonl'):
+            fmt = 'csv' if content_type == 'text/csv' else 'ndjson'
+            # Iterate the underlying request so the body is never held whole.
+            lines = request._request
+        else:
+            raise ValidationError({'file': 'Send a CSV or NDJSON file.'})
+
+        importer = InvoiceImporter(chunk_size=settings.INVOICE_IMPORT_CHUNK_SIZE)
+        return Response(importer.run(read_records(lines, fmt)))
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the caller's invoices as CSV (default) or ``?output=ndjson``."""
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in FORMATS:
+            raise ValidationError({'output': f"Must be one of {', '.join(FORMATS)}."})
+        invoices = self.filter_queryset(self.get_queryset())
+        if not request.user.is_staff:
+            invoices = invoices.filter(Q(lawyer=request.user) | Q(client=request.user))
+        response = StreamingHttpResponse(iter_export(invoices, fmt), content_type=CONTENT_TYPES[fmt])
+        response['Content-Disposition'] = f'attachment; filename="invoices.{fmt}"'
+        return response
+
     def perform_create(self, serializer):
-        
-        message = serializer.save(client=self.request.user)
-        lawyer_id= self.request.data.get('lawyer')
-         # Retrieve the lawyer's profile to get the per_case_charge
-        lawyer_profile = get_object_or_404(LawyerProfile, user_id=lawyer_id)
-        
+        lawyer_id = self.request.data.get('lawyer')
+        # Retrieve the lawyer's profile to get the per_case_charge
+        lawyer_profile = get_object_or_404(LawyerProfile.objects.select_related('user'), user_id=lawyer_id)
+
         # Determine the status based on the per_case_charge
-        if message.amount >= lawyer_profile.per_case_charge:
-            message.status = 'paid'
-        else:
-            message.status = 'pending'
-        
-        # Save the updated invoice with the new status
-        message.save()
-        print(self.request.data)
-        user = User.objects.get(id=lawyer_id)
+        amount = serializer.validated_data['amount']
+        status_value = 'paid' if amount >= lawyer_profile.per_case_charge else 'pending'
+        message = serializer.save(client=self.request.user, status=status_value)
+
         # Create notification for recipient
-        create_notification(user=user,
+        create_notification(user=lawyer_profile.user,
             notif_type='invoice',
             title='payment',
             content="message credited",
             related_id=message.id
         )
+class DashboardView(APIView):
+    """Everything the landing page shows for the current user, in one payload."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response(get_dashboard(request.user))
+
+
 class AcceptCase(APIView):
 
     permission_classes = [IsAuthenticated]
 
     def post(self, request, case_id):
-        case = get_object_or_404(Case, id=case_id)
- # Get additional data from the request body if needed
-        
         if request.user.role != 'lawyer':
-            accepted_by_lawyer = request.data.get('accepted_by_lawyer', request.user.id)
             lawyer_id = request.data.get('lawyer', request.user.id)
-            print(accepted_by_lawyer,lawyer_id)
+            accepted_by_lawyer = request.data.get('accepted_by_lawyer', lawyer_id)
+            try:
+                lawyer_ids = {int(lawyer_id), int(accepted_by_lawyer)}
+            except (TypeError, ValueError):
+                return Response({'error': 'lawyer and accepted_by_lawyer must be user ids.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Both must be lawyers; an unknown id would otherwise only fail
+            # as a foreign key error at commit.
+            if User.objects.filter(id__in=lawyer_ids, role='lawyer').count() != len(lawyer_ids):
+                return Response({'error': 'Lawyer not found.'}, status=status.HTTP_400_BAD_REQUEST)
         else:
             accepted_by_lawyer = request.user.id
             lawyer_id = request.user.id
 
-        if case.lawyer:
-            return Response({'error': 'This case has already been accepted.'}, status=status.HTTP_400_BAD_REQUEST)
-
-       
-
-        # Assign lawyer and update the case status
-        case.lawyer = lawyer_id
-        case.accepted_by_lawyer = accepted_by_lawyer
-        case.status = 'in_review'
-        case.save()
-
-        # Create a thread for this case
-        thread, created = Thread.objects.get_or_create(case=case)
-        thread.participants.add(case.client, request.user)
-
-        # Notify the client about the case acceptance
-        create_notification(
-            user=case.client,
-            notif_type='case',
-            title='Case Accepted',
-            content=f"Your case '{case.title}' was accepted by {request.user.get_full_name()}",
-            related_id=case.id
-        )
+        with transaction.atomic():
+            # Claim before reading so the write lock is taken first.
+            claimed = Case.claim(case_id, lawyer_id, accepted_by_lawyer)
+            case = get_object_or_404(Case.objects.select_related('client', 'lawyer'), id=case_id)
+            if not claimed:
+                return Response({'error': 'This case has already been accepted.'}, status=status.HTTP_400_BAD_REQUEST)
+            transaction.on_commit(lambda: invalidate_dashboards(case.client_id, case.lawyer_id))
+
+            # The thread is between the client and the assigned lawyer, who
+            # is not the caller when staff accept on a lawyer's behalf.
+            thread, thread_created = Thread.get_or_create_thread(case.client, case.lawyer, case)
+
+            # Notify the client about the case acceptance; queued until commit.
+            create_notification(
+                user=case.client,
+                notif_type='case',
+                title='Case Accepted',
+                content=f"Your case '{case.title}' was accepted by {case.lawyer.get_full_name()}",
+                related_id=case.id
+            )
 
         return Response({
             'message': 'Case accepted successfully. Chat thread created.',
             'thread_id': thread.id,
-            'thread_created': created
+            'thread_created': thread_created,
         }, status=status.HTTP_200_OK)
         # Assign lawyer and update status
         
@@ -219,6 +534,8 @@ class CaseRequestViewSet(viewsets.ModelViewSet):
     queryset = CaseRequest.objects.all()
     serializer_class = CaseRequestSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+    filter_backends = [ListFilterBackend]
 
     def get_queryset(self):
         user = self.request.user
@@ -1,8 +1,21 @@
 from django.contrib import admin
-from .models import Notification
+from .models import Notification, NotificationArchive, UnreadCounter
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ('user', 'type', 'title', 'is_read', 'created_at')
     list_filter = ('type', 'is_read')
     search_fields = ('title', 'content', 'user__username')
+
+
+@admin.register(UnreadCounter)
+class UnreadCounterAdmin(admin.ModelAdmin):
+    list_display = ('user', 'unread')
+    search_fields = ('user__username',)
+
+
+@admin.register(NotificationArchive)
+class NotificationArchiveAdmin(admin.ModelAdmin):
+    list_display = ('user', 'type', 'title', 'created_at', 'archived_at')
+    list_filter = ('type',)
+    search_fields = ('title', 'user__username')
@@ -0,0 +1,57 @@
+"""Unread-notification counters.
+
+Every path that creates notifications or marks them read goes through here,
+so ``UnreadCounter`` stays in step with ``Notification.is_read`` and the
+badge can be served without counting rows.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+
+from .models import Notification, UnreadCounter
+
+
+def add_unread(notifications):
+    """Count freshly created ``notifications`` against their recipients."""
+    per_user = Counter(notification.user_id for notification in notifications if not notification.is_read)
+    if not per_user:
+        return
+    UnreadCounter.objects.bulk_create([UnreadCounter(user_id=user_id) for user_id in per_user], ignore_conflicts=True)
+    # Users who received the same number of rows share one UPDATE.
+    by_amount = defaultdict(list)
+    for user_id, amount in per_user.items():
+        by_amount[amount].append(user_id)
+    for amount, user_ids in by_amount.items():
+        UnreadCounter.objects.filter(user_id__in=user_ids).update(unread=F('unread') + amount)
+
+
+def unread_count(user):
+    # Only the id is used, so token-backed users work here too.
+    counter = UnreadCounter.objects.filter(user_id=user.pk).values_list('unread', flat=True).first()
+    if counter is None:
+        # Users without a counter yet get one seeded from their rows.
+        counter = Notification.objects.filter(user_id=user.pk, is_read=False).count()
+        UnreadCounter.objects.get_or_create(user_id=user.pk, defaults={'unread': counter})
+    return counter
+
+
+def mark_read(user, ids=None, up_to=None):
+    """Mark ``user``'s notifications in ``ids`` and/or with id <= ``up_to`` read.
+
+    Returns how many were unread before. Both the flag flip and the counter
+    adjustment are single UPDATEs.
+    """
+    selection = Q()
+    if ids:
+        selection |= Q(id__in=ids)
+    if up_to is not None:
+        selection |= Q(id__lte=up_to)
+    if not selection:
+        return 0
+    with transaction.atomic():
+        marked = Notification.objects.filter(selection, user=user, is_read=False).update(is_read=True)
+        if marked:
+            UnreadCounter.objects.filter(user=user).update(unread=Greatest(F('unread') - marked, 0))
+    return marked
@@ -0,0 +1,150 @@
+"""Background delivery of notifications.
+
+``create_notification`` hands payloads to the process-wide ``dispatcher``
+once the surrounding transaction commits. A daemon thread drains the queue
+in batches and writes each batch with a single ``bulk_create``; failed
+batches are retried with backoff, and every payload carries a
+``dedupe_key`` so a retried batch never inserts the same notification twice.
+
+Once written, new rows are pushed to each recipient's ``notifications_<id>``
+channel group for ``NotificationConsumer`` to forward.
+
+The queue lives in memory: anything still queued when the process is killed
+is lost, and ``drain()`` runs at interpreter exit to keep that window small.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+
+from .counters import add_unread
+from .models import Notification
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def write_notifications(payloads):
+    """Insert ``payloads`` that have not been written yet and return the new rows."""
+    keys = [payload['dedupe_key'] for payload in payloads]
+    with transaction.atomic():
+        written = set(Notification.objects.filter(dedupe_key__in=keys).values_list('dedupe_key', flat=True))
+        fresh = {}
+        for payload in payloads:
+            if payload['dedupe_key'] not in written:
+                fresh.setdefault(payload['dedupe_key'], Notification(**payload))
+        created = Notification.objects.bulk_create(fresh.values())
+        add_unread(created)
+        if created:
+            transaction.on_commit(lambda: publish(created))
+        return created
+
+
+def notification_group(user_id):
+    return f'notifications_{user_id}'
+
+
+def publish(notifications):
+    """Push ``notifications`` to their recipients' open sockets.
+
+    Delivery is best effort: a client that misses a push picks the rows up
+    through the ``since`` catch-up when it reconnects.
+    """
+    try:
+        channel_layer = get_channel_layer()
+    except Exception:
+        logger.exception("Channel layer unavailable; not pushing %d notifications", len(notifications))
+        return
+    if channel_layer is None:
+        return
+    by_user = defaultdict(list)
+    for data in NotificationSerializer(notifications, many=True).data:
+        by_user[data['user']].append(data)
+    send = async_to_sync(channel_layer.group_send)
+    for user_id, rows in by_user.items():
+        try:
+            send(notification_group(user_id), {'type': 'notifications.created', 'notifications': rows})
+        except Exception:
+            logger.exception("Failed to push %d notifications to user %s", len(rows), user_id)
+
+
+class NotificationDispatcher:
+    def __init__(self, batch_size, max_wait, max_attempts=5, retry_delay=0.2):
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, payloads):
+        for payload in payloads:
+            self.queue.put(payload)
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='notification-dispatcher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._deliver(batch)
+            close_old_connections()
+
+    def _deliver(self, batch):
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    return write_notifications(batch)
+                except DatabaseError:
+                    if attempt == self.max_attempts:
+                        logger.exception("Dropping %d notifications after %d attempts", len(batch), attempt)
+                        return []
+                    if not transaction.get_connection().in_atomic_block:
+                        close_old_connections()
+                    time.sleep(self.retry_delay * 2 ** (attempt - 1))
+        finally:
+            for _ in batch:
+                self.queue.task_done()
+
+    def drain(self):
+        """Deliver everything queued so far from the calling thread."""
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._deliver(batch)
+
+    def join(self):
+        """Block until the worker has processed every queued payload."""
+        self.queue.join()
+
+
+dispatcher = NotificationDispatcher(
+    batch_size=getattr(settings, 'NOTIFICATION_BATCH_SIZE', 200),
+    max_wait=getattr(settings, 'NOTIFICATION_BATCH_WAIT', 0.5),
+)
+atexit.register(dispatcher.drain)
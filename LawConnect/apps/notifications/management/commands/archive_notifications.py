@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.notifications.models import Notification, NotificationArchive
+
+ARCHIVED_FIELDS = ('id', 'user_id', 'type', 'title', 'content', 'created_at', 'related_id')
+
+
+class Command(BaseCommand):
+    help = ("Move read notifications older than NOTIFICATION_RETENTION_DAYS into the archive table, "
+            "one bounded batch per transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.NOTIFICATION_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.NOTIFICATION_ARCHIVE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches; the next run picks up where this one left off.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = (Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+                   .order_by('created_at', 'id'))
+
+        archived = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            with transaction.atomic():
+                rows = list(expired.values(*ARCHIVED_FIELDS)[:options['batch_size']])
+                if not rows:
+                    break
+                # ignore_conflicts keeps a rerun after a partial failure harmless.
+                NotificationArchive.objects.bulk_create(
+                    [NotificationArchive(**row) for row in rows], ignore_conflicts=True,
+                )
+                Notification.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            archived += len(rows)
+            batches += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Archived {archived} notifications in {batches} batches."))
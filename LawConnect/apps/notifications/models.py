@@ -18,6 +18,45 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     related_id = models.CharField(max_length=100, blank=True, null=True)
+    # Set by the dispatcher so a retried batch cannot insert a row twice.
+    dedupe_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='notification_user_created_idx'),
+            # Lets the archive job find expired rows without scanning unread ones.
+            models.Index(fields=['created_at', 'id'], name='notification_read_created_idx',
+                         condition=models.Q(is_read=True)),
+        ]
 
     def __str__(self):
         return f"{self.type} for {self.user.username}"
+
+
+class UnreadCounter(models.Model):
+    """Running count of a user's unread notifications, kept by ``apps.notifications.counters``."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='unread_notifications')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.unread} unread for {self.user_id}"
+
+
+class NotificationArchive(models.Model):
+    """Read notifications past the retention window, keyed by their original id."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_notifications')
+    type = models.CharField(max_length=20, choices=Notification.NOTIFICATION_TYPES)
+    title = models.CharField(max_length=255)
+    content = models.TextField()
+    created_at = models.DateTimeField()
+    related_id = models.CharField(max_length=100, blank=True, null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_archive_user_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"archived {self.type} for {self.user_id}"
@@ -1,8 +1,23 @@
 from rest_framework import serializers
-from .models import Notification
+from .models import Notification, NotificationArchive
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = '__all__'
- 
\ No newline at end of file
+ 
+
+class NotificationArchiveSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = NotificationArchive
+        fields = ['id', 'type', 'title', 'content', 'created_at', 'related_id', 'archived_at']
+
+
+class MarkReadSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, max_length=1000)
+    up_to = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('ids') and 'up_to' not in attrs:
+            raise serializers.ValidationError("Provide ids or up_to.")
+        return attrs
@@ -1,10 +1,42 @@
-from .models import Notification
-
-def create_notification(user, notif_type, title, content, related_id=None):
-    Notification.objects.create(
-        user=user,
-        type=notif_type,
-        title=title,
-        content=content,
-        related_id=related_id
-    )
\ No newline at end of file
+import uuid
+
+from django.conf import settings
+from django.db import transaction
+
+from .dispatch import dispatcher, write_notifications
+
+
+def notification_payload(user, notif_type, title, content, related_id=None, dedupe_key=None):
+    """Describe one notification; ``user`` may be a user or a user id.
+
+    Pass a deterministic ``dedupe_key`` when the same event could be reported
+    more than once; otherwise every call gets a fresh key.
+    """
+    return {
+        'user_id': getattr(user, 'pk', user),
+        'type': notif_type,
+        'title': title,
+        'content': content,
+        'related_id': None if related_id is None else str(related_id),
+        'dedupe_key': dedupe_key or uuid.uuid4().hex,
+    }
+
+
+def create_notifications(payloads):
+    """Deliver a batch of ``notification_payload`` dicts.
+
+    With ``NOTIFICATION_DELIVERY = 'sync'`` they are inserted immediately;
+    otherwise they are queued for the background dispatcher once the current
+    transaction commits, so the request only pays for the enqueue.
+    """
+    payloads = list(payloads)
+    if not payloads:
+        return
+    if getattr(settings, 'NOTIFICATION_DELIVERY', 'async') == 'sync':
+        write_notifications(payloads)
+        return
+    transaction.on_commit(lambda: dispatcher.enqueue(payloads))
+
+
+def create_notification(user, notif_type, title, content, related_id=None, dedupe_key=None):
+    create_notifications([notification_payload(user, notif_type, title, content, related_id, dedupe_key)])
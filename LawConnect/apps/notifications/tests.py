@@ -1,6 +1,21 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import OperationalError, transaction
+from django.utils import timezone
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APITestCase
+from django.urls import path
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
 from apps.users.models import User
-from .models import Notification
+from LawConnect.consumers import NotificationConsumer
+from .dispatch import dispatcher, write_notifications
+from .models import Notification, NotificationArchive, UnreadCounter
+from .signals import create_notification, notification_payload
 
 class NotificationModelTest(TestCase):
     def setUp(self):
@@ -15,3 +30,172 @@ class NotificationModelTest(TestCase):
     def test_notification_created(self):
         self.assertEqual(Notification.objects.count(), 1)
         self.assertEqual(self.notification.title, 'Test Notification')
+
+
+class NotificationIndexTest(TestCase):
+    def test_user_listing_uses_index(self):
+        user = User.objects.create_user(username='idxuser', email='idxuser@example.com', password='testpass', role='client')
+        plan = Notification.objects.filter(user=user).order_by('-created_at').explain()
+        self.assertIn('notification_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+
+class NotificationPipelineTest(TestCase):
+    def setUp(self):
+        # Deliver from the test thread so writes land in the test transaction.
+        patcher = mock.patch.object(dispatcher, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(dispatcher.drain)
+        self.user = User.objects.create_user(username='pipeuser', email='pipeuser@example.com', password='testpass', role='client')
+
+    def test_request_path_only_enqueues(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertNumQueries(0):
+                for i in range(250):
+                    create_notification(self.user, 'case', 'Title', f'body {i}', related_id=i)
+        self.assertEqual(Notification.objects.count(), 0)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', wraps=Notification.objects.bulk_create) as bulk_create:
+            dispatcher.drain()
+        self.assertEqual(bulk_create.call_count, 2)
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 250)
+
+    def test_rolled_back_work_sends_nothing(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    create_notification(self.user, 'case', 'Title', 'body')
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(callbacks, [])
+
+    def test_retried_batches_are_idempotent(self):
+        payload = notification_payload(self.user, 'invoice', 'Paid', 'body', dedupe_key='invoice-1-paid')
+        real_bulk_create = Notification.objects.bulk_create
+        calls = []
+
+        def flaky(objs):
+            calls.append(len(objs))
+            if len(calls) == 1:
+                raise OperationalError('database is locked')
+            return real_bulk_create(objs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=flaky), \
+                mock.patch.object(dispatcher, 'retry_delay', 0):
+            dispatcher.enqueue([payload, dict(payload)])
+            dispatcher.drain()
+        dispatcher.enqueue([dict(payload)])
+        dispatcher.drain()
+        self.assertEqual(Notification.objects.filter(dedupe_key='invoice-1-paid').count(), 1)
+        self.assertEqual(calls, [1, 1])
+
+    @override_settings(NOTIFICATION_DELIVERY='sync')
+    def test_sync_fallback_inserts_inline(self):
+        create_notification(self.user, 'case', 'Title', 'body')
+        self.assertEqual(Notification.objects.filter(user=self.user).count(), 1)
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class NotificationConsumerTest(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='sockuser', email='sockuser@example.com', password='testpass', role='client')
+        self.other = User.objects.create_user(username='sockother', email='sockother@example.com', password='testpass', role='client')
+
+    async def connect(self, user, query=''):
+        communicator = WebsocketCommunicator(
+            URLRouter([path('ws/notifications/', NotificationConsumer.as_asgi())]), '/ws/notifications/' + query,
+        )
+        communicator.scope['user'] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_new_notifications_are_pushed_to_their_owner(self):
+        mine = await self.connect(self.user)
+        theirs = await self.connect(self.other)
+        await database_sync_to_async(write_notifications)([
+            notification_payload(self.user, 'case', 'Accepted', 'body'),
+            notification_payload(self.user, 'invoice', 'Paid', 'body'),
+        ])
+        received = await mine.receive_json_from()
+        self.assertEqual(received['type'], 'notifications')
+        self.assertEqual([row['title'] for row in received['notifications']], ['Accepted', 'Paid'])
+        self.assertTrue(await theirs.receive_nothing())
+        await mine.disconnect()
+        await theirs.disconnect()
+
+    async def test_reconnect_catches_up_since_last_seen(self):
+        seen = await database_sync_to_async(Notification.objects.create)(
+            user=self.user, type='case', title='Seen', content='body')
+        await database_sync_to_async(Notification.objects.create)(
+            user=self.user, type='case', title='Missed', content='body')
+        communicator = await self.connect(self.user, f'?since={seen.id}')
+        received = await communicator.receive_json_from()
+        self.assertEqual([row['title'] for row in received['notifications']], ['Missed'])
+        self.assertFalse(received['has_more'])
+        await communicator.disconnect()
+
+
+class UnreadCounterTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='badgeuser', email='badgeuser@example.com', password='testpass', role='client')
+        self.other = User.objects.create_user(username='badgeother', email='badgeother@example.com', password='testpass', role='client')
+        self.client.force_authenticate(self.user)
+        write_notifications([notification_payload(self.user, 'case', f'n{i}', 'body') for i in range(5)]
+                            + [notification_payload(self.other, 'case', 'theirs', 'body')])
+        self.ids = list(Notification.objects.filter(user=self.user).order_by('id').values_list('id', flat=True))
+
+    def test_unread_count_reads_the_counter(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/notifications/notifications/unread-count/')
+        self.assertEqual(response.data, {'unread': 5})
+
+    def test_mark_read_by_ids_and_up_to(self):
+        response = self.client.post('/notifications/notifications/mark-read/', {'ids': self.ids[:2]}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 3})
+        # Already-read rows are not counted twice.
+        response = self.client.post('/notifications/notifications/mark-read/', {'up_to': self.ids[3]}, format='json')
+        self.assertEqual(response.data, {'marked': 2, 'unread': 1})
+        self.assertEqual(Notification.objects.filter(user=self.user, is_read=False).count(), 1)
+        self.assertEqual(UnreadCounter.objects.get(user=self.other).unread, 1)
+
+    def test_mark_read_ignores_other_users_rows(self):
+        theirs = Notification.objects.get(user=self.other).id
+        response = self.client.post('/notifications/notifications/mark-read/', {'ids': [theirs]}, format='json')
+        self.assertEqual(response.data['marked'], 0)
+        self.assertFalse(Notification.objects.get(id=theirs).is_read)
+
+    def test_mark_read_requires_a_selection(self):
+        response = self.client.post('/notifications/notifications/mark-read/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class NotificationArchiveTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='archuser', email='archuser@example.com', password='testpass', role='client')
+        old = timezone.now() - timedelta(days=120)
+        for i in range(5):
+            Notification.objects.create(user=self.user, type='case', title=f'old read {i}', content='body', is_read=True)
+        Notification.objects.create(user=self.user, type='case', title='old unread', content='body')
+        Notification.objects.update(created_at=old)
+        Notification.objects.create(user=self.user, type='case', title='recent read', content='body', is_read=True)
+
+    def test_archives_only_expired_read_rows_in_batches(self):
+        out = StringIO()
+        call_command('archive_notifications', days=90, batch_size=2, max_batches=2, stdout=out)
+        self.assertIn('Archived 4 notifications in 2 batches', out.getvalue())
+        call_command('archive_notifications', days=90, batch_size=2, stdout=StringIO())
+
+        self.assertEqual(NotificationArchive.objects.filter(user=self.user).count(), 5)
+        self.assertEqual(sorted(Notification.objects.values_list('title', flat=True)), ['old unread', 'recent read'])
+
+    def test_archive_endpoint_pages_users_old_items(self):
+        call_command('archive_notifications', days=90, stdout=StringIO())
+        self.client.force_authenticate(self.user)
+        response = self.client.get('/notifications/archive/', {'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNone(response.data['next'])
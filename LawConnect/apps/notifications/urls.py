@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificationViewSet
+from .views import NotificationArchiveViewSet, NotificationViewSet
 
 router = DefaultRouter()
 router.register(r'notifications', NotificationViewSet, basename='notification')
+router.register(r'archive', NotificationArchiveViewSet, basename='notification-archive')
 
 urlpatterns = [
     path('', include(router.urls)),
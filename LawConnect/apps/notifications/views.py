@@ -1,6 +1,13 @@
+from django.db import transaction
 from rest_framework import viewsets, permissions
-from .models import Notification
-from .serializers import NotificationSerializer
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from .counters import add_unread, mark_read, unread_count
+from .dispatch import publish
+from apps.cases.pagination import CreatedAtCursorPagination
+from apps.users.authentication import ClaimsJWTAuthentication
+from .models import Notification, NotificationArchive
+from .serializers import MarkReadSerializer, NotificationArchiveSerializer, NotificationSerializer
 
 from rest_framework import viewsets, mixins
 
@@ -15,4 +22,31 @@ class NotificationViewSet(mixins.CreateModelMixin,
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            notification = serializer.save(user=self.request.user)
+            add_unread([notification])
+        transaction.on_commit(lambda: publish([notification]))
+
+    # Polled for the badge; the token alone identifies the caller.
+    @action(detail=False, methods=['get'], url_path='unread-count',
+            authentication_classes=[ClaimsJWTAuthentication])
+    def unread_count(self, request):
+        return Response({'unread': unread_count(request.user)})
+
+    @action(detail=False, methods=['post'], url_path='mark-read')
+    def mark_read(self, request):
+        """Mark ``ids`` and/or everything with id <= ``up_to`` as read."""
+        params = MarkReadSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        marked = mark_read(request.user, **params.validated_data)
+        return Response({'marked': marked, 'unread': unread_count(request.user)})
+
+
+class NotificationArchiveViewSet(viewsets.ReadOnlyModelViewSet):
+    """Read notifications that aged out of the main table, newest first."""
+    serializer_class = NotificationArchiveSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return NotificationArchive.objects.filter(user=self.request.user)
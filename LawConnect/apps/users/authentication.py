@@ -0,0 +1,93 @@
+"""JWT authentication without a user query per request.
+
+``CachedJWTAuthentication`` verifies the token as usual but serves the user
+from the cache, keyed by a per-user version stamp. Saving or deleting a user
+and logging out bump that stamp (see ``apps.users.signal`` and
+``LogoutView``), so a changed or deactivated account is reloaded on its next
+request rather than after ``USER_CACHE_TIMEOUT``.
+
+Only ``CACHED_USER_FIELDS`` are cached, never the password hash. The user is
+rebuilt with every other field deferred, as ``.only()`` would load it:
+reading one of them costs a query, and ``save()`` writes back only the cached
+fields, so a stale cached user cannot overwrite ``last_login`` or the
+password.
+
+``ClaimsJWTAuthentication`` goes further and never touches the database: the
+user is built from the token's claims (id, role, staff flags). It suits
+hot read-only endpoints that only filter by the caller's id or role, and it
+trusts the token until it expires, so keep it off anything that writes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import bump_version, get_version
+
+
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'first_name', 'last_name', 'role',
+                      'is_active', 'is_staff', 'is_superuser')
+
+
+def user_version_key(user_id):
+    return f'auth_user:{user_id}:version'
+
+
+def user_cache_key(user_id):
+    return f'auth_user:{user_id}:{get_version(user_version_key(user_id))}'
+
+
+def invalidate_user(user_id):
+    """Make the next request from ``user_id`` reload the user row."""
+    bump_version(user_version_key(user_id))
+
+
+def add_user_claims(token, user):
+    """Copy the claims ``ClaimsJWTAuthentication`` exposes onto ``token``."""
+    token['role'] = user.role
+    token['username'] = user.username
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # The revocation check needs the password hash, which is never cached.
+            return super().get_user(validated_token)
+
+        # from_db expects values in the model's field order.
+        fields = [field.attname for field in self.user_model._meta.concrete_fields
+                  if field.attname in CACHED_USER_FIELDS]
+        key = user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = self.user_model.objects.filter(pk=user_id).values_list(*fields).first()
+            if values is None:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            cache.set(key, values, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+        user = self.user_model.from_db(router.db_for_read(self.user_model), fields, values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class ClaimsJWTAuthentication(CachedJWTAuthentication):
+    """Token-backed users; ``request.user.role`` and friends come from claims.
+
+    Tokens issued before the claims were added fall back to the cached user.
+    """
+
+    def get_user(self, validated_token):
+        if 'role' not in validated_token:
+            return super().get_user(validated_token)
+        return JWTStatelessUserAuthentication.get_user(self, validated_token)
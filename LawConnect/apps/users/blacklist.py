@@ -0,0 +1,145 @@
+"""Refresh-token blacklist checks that rarely reach the database.
+
+simplejwt looks every refresh token up in ``BlacklistedToken``. Here each
+process keeps a ``BlacklistIndex`` instead: a bloom filter over the JTIs of
+blacklisted, unexpired tokens plus an exact set of the ones blacklisted since
+the filter was built. A JTI the filter has never seen is answered straight
+away; only filter hits outside the exact set (old revocations or false
+positives) are confirmed against the table.
+
+Processes learn about each other's revocations through a version stamp in
+the shared cache: blacklisting a token bumps it once the transaction
+commits, and a process that sees a new stamp pulls the newest blacklist rows
+by primary key. The filter is rebuilt from scratch every
+``TOKEN_BLACKLIST_REBUILD_INTERVAL`` seconds so pruned tokens drop out of it.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication
+from .cache import bump_version, get_version
+
+BLACKLIST_VERSION_KEY = 'token_blacklist:version'
+# Rows written by transactions that committed out of id order are picked up
+# as long as they are within this many ids of the newest row already seen.
+SYNC_OVERLAP = 100
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(capacity, 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistIndex:
+    def __init__(self, rebuild_interval, error_rate=0.01):
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self.bloom = None
+        self.recent = set()
+        self.version = None
+        self.last_id = 0
+        self.built_at = 0
+        self._lock = threading.Lock()
+
+    def _rows(self, queryset):
+        return queryset.filter(token__expires_at__gt=timezone.now()).values_list('id', 'token__jti')
+
+    def rebuild(self):
+        version = get_version(BLACKLIST_VERSION_KEY)
+        last_id = BlacklistedToken.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        rows = list(self._rows(BlacklistedToken.objects.all()))
+        # Headroom so a burst of logouts does not push up the error rate
+        # before the next rebuild.
+        bloom = BloomFilter(max(2 * len(rows), 1024), self.error_rate)
+        for _, jti in rows:
+            bloom.add(jti)
+        self.bloom, self.recent, self.version = bloom, set(), version
+        self.last_id = max([last_id, *(pk for pk, _ in rows)])
+        self.built_at = time.monotonic()
+
+    def sync(self):
+        """Bring the index up to date if the blacklist changed since the last look."""
+        with self._lock:
+            if self.bloom is None or time.monotonic() - self.built_at > self.rebuild_interval:
+                self.rebuild()
+                return
+            version = get_version(BLACKLIST_VERSION_KEY)
+            if version == self.version:
+                return
+            self.version = version
+            for pk, jti in self._rows(BlacklistedToken.objects.filter(id__gt=self.last_id - SYNC_OVERLAP)):
+                self.add(jti)
+                self.last_id = max(self.last_id, pk)
+
+    def add(self, jti):
+        if self.bloom is not None:
+            self.bloom.add(jti)
+        self.recent.add(jti)
+
+    def contains(self, jti):
+        self.sync()
+        if jti in self.recent:
+            return True
+        if jti not in self.bloom:
+            return False
+        return BlacklistedToken.objects.filter(token__jti=jti).exists()
+
+
+blacklist_index = BlacklistIndex(rebuild_interval=getattr(settings, 'TOKEN_BLACKLIST_REBUILD_INTERVAL', 3600))
+
+
+class IndexedRefreshToken(RefreshToken):
+    """A refresh token checked against ``blacklist_index``."""
+
+    def check_blacklist(self):
+        if blacklist_index.contains(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        result = super().blacklist()
+        blacklist_index.add(self.payload[api_settings.JTI_CLAIM])
+        transaction.on_commit(lambda: bump_version(BLACKLIST_VERSION_KEY))
+        return result
+
+
+class IndexedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refreshes without a query in the common case.
+
+    The blacklist goes through ``blacklist_index`` and the active-account
+    check uses the cached user from ``CachedJWTAuthentication``.
+    """
+    token_class = IndexedRefreshToken
+
+    def validate(self, attrs):
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            return super().validate(attrs)
+        refresh = self.token_class(attrs['refresh'])
+        CachedJWTAuthentication().get_user(refresh)
+        return {'access': str(refresh.access_token)}
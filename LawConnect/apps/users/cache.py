@@ -0,0 +1,30 @@
+import time
+
+from django.core.cache import cache
+
+DIRECTORY_VERSION_KEY = 'lawyer_directory:version'
+
+
+def get_version(key):
+    """Return the current version stamp stored under ``key``.
+
+    Versions start from the clock rather than 1 so that a cache restart can
+    never bring back entries written under an older, reused number.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """Invalidate everything cached under the previous version of ``key``."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def directory_cache_key(querystring):
+    return f'lawyer_directory:{get_version(DIRECTORY_VERSION_KEY)}:{querystring}'
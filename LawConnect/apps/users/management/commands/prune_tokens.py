@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+
+class Command(BaseCommand):
+    help = ("Delete expired outstanding refresh tokens, and their blacklist entries, "
+            "one bounded batch per transaction.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.TOKEN_PRUNE_BATCH_SIZE)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help="Stop after this many batches; the next run picks up where this one left off.")
+
+    def handle(self, *args, **options):
+        expired = OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+
+        # Tokens share one lifetime, so expired rows sit at the low end of the
+        # primary key and walking it finds them without an expires_at index.
+        last_id = outstanding = blacklisted = batches = 0
+        while options['max_batches'] is None or batches < options['max_batches']:
+            with transaction.atomic():
+                ids = list(expired.filter(id__gt=last_id).order_by('id')
+                           .values_list('id', flat=True)[:options['batch_size']])
+                if not ids:
+                    break
+                _, deleted = OutstandingToken.objects.filter(id__in=ids).delete()
+            outstanding += deleted.get('token_blacklist.OutstandingToken', 0)
+            blacklisted += deleted.get('token_blacklist.BlacklistedToken', 0)
+            last_id = ids[-1]
+            batches += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Pruned {outstanding} outstanding and {blacklisted} blacklisted tokens in {batches} batches."
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_lawyerprofile_bio_lawyerprofile_experience_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'username', 'id'], name='user_role_username_idx'),
+        ),
+    ]
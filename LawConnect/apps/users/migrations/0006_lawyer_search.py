@@ -0,0 +1,55 @@
+from django.db import migrations
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE users_lawyer_search USING fts5("
+    "name, specialization, firm, bio, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')",
+    "CREATE VIRTUAL TABLE users_lawyer_search_vocab USING fts5vocab(users_lawyer_search, 'row')",
+    "INSERT INTO users_lawyer_search (rowid, name, specialization, firm, bio) "
+    "SELECT u.id, TRIM(u.username || ' ' || u.first_name || ' ' || u.last_name), "
+    "COALESCE(p.specialization, ''), COALESCE(p.firm, ''), COALESCE(p.bio, '') "
+    "FROM users_lawyerprofile p JOIN users_user u ON u.id = p.user_id WHERE u.role = 'lawyer'",
+]
+SQLITE_DROP = [
+    "DROP TABLE IF EXISTS users_lawyer_search_vocab",
+    "DROP TABLE IF EXISTS users_lawyer_search",
+]
+
+POSTGRES_CREATE = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE users_lawyer_search ("
+    "user_id bigint PRIMARY KEY REFERENCES users_user (id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "document text NOT NULL, vector tsvector NOT NULL)",
+    "CREATE INDEX users_lawyer_search_vector_idx ON users_lawyer_search USING GIN (vector)",
+    "CREATE INDEX users_lawyer_search_trgm_idx ON users_lawyer_search USING GIN (document gin_trgm_ops)",
+    "INSERT INTO users_lawyer_search (user_id, document, vector) "
+    "SELECT u.id, concat_ws(' ', u.username, u.first_name, u.last_name, p.specialization, p.firm, p.bio), "
+    "setweight(to_tsvector('simple', concat_ws(' ', u.username, u.first_name, u.last_name)), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(p.specialization, '')), 'B') || "
+    "setweight(to_tsvector('simple', COALESCE(p.firm, '')), 'C') || "
+    "setweight(to_tsvector('simple', COALESCE(p.bio, '')), 'D') "
+    "FROM users_lawyerprofile p JOIN users_user u ON u.id = p.user_id WHERE u.role = 'lawyer'",
+]
+POSTGRES_DROP = [
+    "DROP TABLE IF EXISTS users_lawyer_search",
+]
+
+
+def run(statements):
+    def apply(apps, schema_editor):
+        for sql in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return apply
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_user_role_username_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run({'sqlite': SQLITE_CREATE, 'postgresql': POSTGRES_CREATE}),
+            run({'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}),
+        ),
+    ]
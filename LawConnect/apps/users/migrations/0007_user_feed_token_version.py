@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_lawyer_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='feed_token_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
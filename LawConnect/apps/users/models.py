@@ -11,9 +11,18 @@ class User(AbstractUser, PermissionsMixin):
     avatar = models.ImageField(upload_to='avatars/', blank=True, null=True)
     phone = models.CharField(max_length=20, blank=True, null=True)
     email=models.EmailField( unique=True)
+    # Mixed into calendar feed tokens; bumping it revokes every feed URL
+    # handed out so far.
+    feed_token_version = models.PositiveIntegerField(default=0, editable=False)
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = []
     objects = UserManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['role', 'username', 'id'], name='user_role_username_idx'),
+        ]
+
     def __str__(self):
         return self.username
 
@@ -0,0 +1,174 @@
+"""Full-text lawyer search.
+
+Each lawyer has one row in ``users_lawyer_search`` holding their name,
+specialization, firm and bio. On SQLite that table is an FTS5 index (with an
+``fts5vocab`` companion used for typo correction); on PostgreSQL it carries a
+weighted ``tsvector`` plus a trigram index. Other databases fall back to
+``icontains`` filters. Rows are kept current by the signals in
+``apps.users.signal``.
+"""
+import difflib
+import math
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import LawyerProfile
+
+TOKEN_RE = re.compile(r'[^\W_]+')
+MAX_TOKENS = 8
+# Typo correction compares against at most this many vocabulary terms.
+MAX_CANDIDATES = 500
+TYPO_CUTOFF = 0.75
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_TOKENS]
+
+
+def lawyer_document(profile):
+    user = profile.user
+    name = ' '.join(part for part in (user.username, user.first_name, user.last_name) if part)
+    return name, profile.specialization or '', profile.firm or '', profile.bio or ''
+
+
+class SqliteSearchBackend:
+    table = 'users_lawyer_search'
+    vocab = 'users_lawyer_search_vocab'
+
+    def index(self, profile):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [profile.user_id])
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, specialization, firm, bio) VALUES (%s, %s, %s, %s, %s)',
+                [profile.user_id, *lawyer_document(profile)],
+            )
+
+    def remove(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE rowid = %s', [user_id])
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        with connection.cursor() as cursor:
+            groups = []
+            for token in tokens:
+                terms = self._expand(cursor, token)
+                if not terms:
+                    return []
+                groups.append('(' + ' OR '.join(f'"{term}"*' for term in terms) + ')')
+            # Name matches outrank specialization, then firm, then bio.
+            cursor.execute(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s '
+                f'ORDER BY bm25({self.table}, 10.0, 5.0, 3.0, 1.0) LIMIT %s',
+                [' AND '.join(groups), limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def _expand(self, cursor, token):
+        """Return the index terms to try for ``token``.
+
+        A token that prefixes some indexed term is used as is. Otherwise the
+        closest terms sharing its first letter are used, which catches the
+        usual one- or two-letter typos without scanning the whole vocabulary.
+        Terms whose length alone keeps them under the similarity cutoff are
+        filtered out in SQL, and at most ``MAX_CANDIDATES`` reach difflib.
+        """
+        cursor.execute(f'SELECT 1 FROM {self.vocab} WHERE term >= %s AND term < %s LIMIT 1',
+                       [token, token + '\uffff'])
+        if cursor.fetchone():
+            return [token]
+        # difflib's ratio is at most 2 * min(len) / (len(a) + len(b)).
+        shortest = math.ceil(len(token) * TYPO_CUTOFF / (2 - TYPO_CUTOFF))
+        longest = math.floor(len(token) * (2 - TYPO_CUTOFF) / TYPO_CUTOFF)
+        cursor.execute(f'SELECT term FROM {self.vocab} WHERE term >= %s AND term < %s '
+                       f'AND length(term) BETWEEN %s AND %s LIMIT %s',
+                       [token[0], chr(ord(token[0]) + 1), shortest, longest, MAX_CANDIDATES])
+        candidates = [row[0] for row in cursor.fetchall()]
+        return difflib.get_close_matches(token, candidates, n=3, cutoff=TYPO_CUTOFF)
+
+
+class PostgresSearchBackend:
+    table = 'users_lawyer_search'
+    vector_sql = ("setweight(to_tsvector('simple', %s), 'A') || setweight(to_tsvector('simple', %s), 'B') || "
+                  "setweight(to_tsvector('simple', %s), 'C') || setweight(to_tsvector('simple', %s), 'D')")
+
+    def index(self, profile):
+        fields = lawyer_document(profile)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} (user_id, document, vector) VALUES (%s, %s, {self.vector_sql}) '
+                f'ON CONFLICT (user_id) DO UPDATE SET document = EXCLUDED.document, vector = EXCLUDED.vector',
+                [profile.user_id, ' '.join(fields), *fields],
+            )
+
+    def remove(self, user_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table} WHERE user_id = %s', [user_id])
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        text = ' '.join(tokens)
+        with connection.cursor() as cursor:
+            # Prefix matches come from the tsvector GIN index, typo-tolerant
+            # ones from the trigram index on the flattened document.
+            cursor.execute(
+                f"SELECT user_id FROM {self.table} "
+                f"WHERE vector @@ to_tsquery('simple', %s) OR %s <%% document "
+                f"ORDER BY ts_rank(vector, to_tsquery('simple', %s)) + word_similarity(%s, document) DESC "
+                f"LIMIT %s",
+                [tsquery, text, tsquery, text, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class FallbackSearchBackend:
+    """Unindexed substring search for databases without a full-text engine."""
+
+    def index(self, profile):
+        pass
+
+    def remove(self, user_id):
+        pass
+
+    def search(self, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        profiles = LawyerProfile.objects.filter(user__role='lawyer')
+        for token in tokens:
+            profiles = profiles.filter(
+                Q(user__username__icontains=token) | Q(user__first_name__icontains=token)
+                | Q(user__last_name__icontains=token) | Q(specialization__icontains=token)
+                | Q(firm__icontains=token) | Q(bio__icontains=token)
+            )
+        return list(profiles.order_by('user__username').values_list('user_id', flat=True)[:limit])
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend():
+    return BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+def index_lawyer(profile):
+    get_backend().index(profile)
+
+
+def remove_lawyer(user_id):
+    get_backend().remove(user_id)
+
+
+def search_lawyers(query, limit=20):
+    """Return lawyer user ids matching ``query``, best match first."""
+    return get_backend().search(query, limit)
@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
+from .authentication import invalidate_user
+from .cache import DIRECTORY_VERSION_KEY, bump_version
 from .models import User, LawyerProfile, ClientProfile
+from .search import index_lawyer, remove_lawyer
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
@@ -9,3 +12,64 @@ def create_user_profile(sender, instance, created, **kwargs):
             LawyerProfile.objects.create(user=instance)
         elif instance.role == 'client':
             ClientProfile.objects.create(user=instance)
+
+
+@receiver(post_init, sender=User)
+def remember_user_role(sender, instance, **kwargs):
+    if 'role' not in instance.get_deferred_fields():
+        instance._loaded_role = instance.role
+
+
+def was_lawyer(instance):
+    return getattr(instance, '_loaded_role', None) == 'lawyer'
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_lawyer_directory_for_user(sender, instance, update_fields=None, **kwargs):
+    # Logins only touch last_login, which the directory does not show.
+    if update_fields == frozenset({'last_login'}):
+        return
+    if instance.role == 'lawyer' or was_lawyer(instance):
+        bump_version(DIRECTORY_VERSION_KEY)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    invalidate_user(instance.pk)
+
+
+@receiver(post_save, sender=LawyerProfile)
+@receiver(post_delete, sender=LawyerProfile)
+def invalidate_lawyer_directory_for_profile(sender, instance, **kwargs):
+    bump_version(DIRECTORY_VERSION_KEY)
+
+
+@receiver(post_save, sender=LawyerProfile)
+def index_lawyer_profile(sender, instance, **kwargs):
+    index_lawyer(instance)
+
+
+@receiver(post_delete, sender=LawyerProfile)
+def unindex_lawyer_profile(sender, instance, **kwargs):
+    remove_lawyer(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+def reindex_lawyer_user(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        instance._loaded_role = instance.role
+        return
+    if instance.role != 'lawyer':
+        # Someone who stops being a lawyer drops out of search at once.
+        if was_lawyer(instance):
+            remove_lawyer(instance.pk)
+    else:
+        try:
+            index_lawyer(instance.lawyer_profile)
+        except LawyerProfile.DoesNotExist:
+            pass
+    instance._loaded_role = instance.role
@@ -1,8 +1,38 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import CachedJWTAuthentication, invalidate_user, user_cache_key
+from .blacklist import BlacklistIndex, blacklist_index
+from .models import LawyerProfile
+from .search import search_lawyers
 
 User = get_user_model()
 
+
+def make_lawyer(username, **profile):
+    # bulk_create skips the post_save hook, which cannot fill the profile's
+    # required columns on its own.
+    lawyer = User(username=username, email=f'{username}@example.com', role='lawyer')
+    lawyer.set_password('testpass')
+    User.objects.bulk_create([lawyer])
+    defaults = {'specialization': 'Civil', 'license': 'L-1', 'firm': 'Firm',
+                'experience': 5, 'per_case_charge': 100}
+    defaults.update(profile)
+    LawyerProfile.objects.create(user=lawyer, **defaults)
+    return lawyer
+
+
 class UserTestCase(TestCase):
     def setUp(self):
         self.user = User.objects.create_user(username='testuser', password='testpass', role='client')
@@ -10,3 +40,185 @@ class UserTestCase(TestCase):
     def test_user_created(self):
         self.assertEqual(self.user.username, 'testuser')
         self.assertEqual(self.user.role, 'client')
+
+
+class LawyerDirectoryTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = User.objects.create_user(username='viewer', email='viewer@example.com', password='testpass', role='client')
+        self.lawyers = [make_lawyer(f'lawyer{i}', specialization='Tax' if i % 2 else 'Family') for i in range(3)]
+        self.client.force_authenticate(self.viewer)
+
+    def test_directory_is_projected_and_paginated(self):
+        response = self.client.get('/users/lawyers/?page_size=2')
+        self.assertEqual(response.data['count'], 3)
+        first = response.data['results'][0]
+        self.assertEqual(first['name'], 'lawyer0')
+        self.assertEqual(first['specialization'], 'Family')
+        self.assertNotIn('password', first)
+        self.assertNotIn('is_superuser', first)
+
+    def test_repeat_hits_are_served_from_cache(self):
+        self.client.get('/users/lawyers/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/users/lawyers/')
+        self.assertEqual(len(response.data['results']), 3)
+
+    @override_settings(ALLOWED_HOSTS=['first.example.com', 'second.example.com', 'testserver'])
+    def test_cached_pages_get_links_for_each_request(self):
+        self.client.get('/users/lawyers/?page_size=1&page=2', HTTP_HOST='first.example.com')
+        with self.assertNumQueries(0):
+            response = self.client.get('/users/lawyers/?page=02&page_size=1', HTTP_HOST='second.example.com')
+        self.assertEqual(response.data['results'][0]['name'], 'lawyer1')
+        self.assertEqual(response.data['next'], 'http://second.example.com/users/lawyers/?page=3&page_size=1')
+        self.assertEqual(response.data['previous'], 'http://second.example.com/users/lawyers/?page_size=1')
+
+        response = self.client.get('/users/lawyers/?page_size=1&page=last')
+        self.assertEqual(response.data['results'][0]['name'], 'lawyer2')
+        self.assertIsNone(response.data['next'])
+        self.assertEqual(self.client.get('/users/lawyers/?page_size=1&page=4').status_code, 404)
+        self.assertEqual(self.client.get('/users/lawyers/?page=abc').status_code, 404)
+
+    def test_profile_changes_invalidate_cache(self):
+        self.client.get('/users/lawyers/')
+        profile = self.lawyers[0].lawyer_profile
+        profile.firm = 'New Firm'
+        profile.save()
+        response = self.client.get('/users/lawyers/')
+        self.assertEqual(response.data['results'][0]['firm'], 'New Firm')
+
+
+class LawyerSearchTest(APITestCase):
+    def setUp(self):
+        self.viewer = User.objects.create_user(username='searcher', email='searcher@example.com', password='testpass', role='client')
+        self.tax = make_lawyer('priya', specialization='Taxation', firm='Mehta Associates', bio='Corporate tax disputes')
+        self.family = make_lawyer('arjun', specialization='Family law', firm='Rao Chambers', bio='Divorce and custody, some tax work')
+        self.client.force_authenticate(self.viewer)
+
+    def search(self, q):
+        response = self.client.get('/users/lawyers/search/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.data['results']]
+
+    def test_prefix_match_ranks_specialization_over_bio(self):
+        self.assertEqual(self.search('tax'), [self.tax.id, self.family.id])
+
+    def test_typos_are_tolerated(self):
+        self.assertEqual(self.search('custdoy'), [self.family.id])
+        self.assertEqual(self.search('mehta asociates'), [self.tax.id])
+
+    def test_former_lawyers_drop_out_of_search_and_directory(self):
+        cache.clear()
+        self.assertEqual(len(self.client.get('/users/lawyers/').data['results']), 2)
+        family = User.objects.get(pk=self.family.pk)
+        family.role = 'client'
+        family.save()
+        self.assertEqual(self.search('tax'), [self.tax.id])
+        self.assertEqual(search_lawyers('rao'), [])
+        self.assertEqual([row['id'] for row in self.client.get('/users/lawyers/').data['results']], [self.tax.id])
+        # Rows the signals never saw are still filtered out of the results.
+        User.objects.filter(pk=self.tax.pk).update(role='client')
+        self.assertEqual(self.search('tax'), [])
+
+    def test_index_follows_profile_changes(self):
+        profile = self.family.lawyer_profile
+        profile.firm = 'Kapoor Legal'
+        profile.save()
+        self.assertEqual(self.search('kapoor'), [self.family.id])
+        self.assertEqual(self.search('rao'), [])
+        profile.delete()
+        self.assertEqual(self.search('kapoor'), [])
+
+
+class CachedAuthenticationTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cached', email='cached@example.com', password='testpass', role='client')
+        self.access = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        # The dashboard is cached as well, so repeat requests only pay for the user.
+        self.assertEqual(self.client.get('/law/dashboard/').status_code, 200)
+
+    def test_user_is_served_from_cache(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/law/dashboard/').status_code, 200)
+
+    def test_save_reloads_user(self):
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        with self.assertNumQueries(1):
+            self.client.get('/law/dashboard/')
+        with self.assertNumQueries(0):
+            self.client.get('/law/dashboard/')
+
+    def test_cached_user_holds_no_password_and_saves_only_cached_fields(self):
+        self.assertNotIn(self.user.password, cache.get(user_cache_key(self.user.pk)))
+        cached = CachedJWTAuthentication().get_user(self.access)
+        login_at = timezone.now()
+        User.objects.filter(pk=self.user.pk).update(last_login=login_at)
+        cached.first_name = 'Changed'
+        cached.save()
+        stored = User.objects.get(pk=self.user.pk)
+        self.assertEqual((stored.first_name, stored.last_login), ('Changed', login_at))
+        self.assertTrue(stored.check_password('testpass'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/law/dashboard/').status_code, 401)
+
+    def test_logout_drops_cached_user(self):
+        self.client.post('/users/logout/', {'refresh': str(RefreshToken.for_user(self.user))})
+        with self.assertNumQueries(1):
+            self.client.get('/law/dashboard/')
+
+    def test_claims_user_skips_user_lookup(self):
+        response = self.client.post('/users/login/', {'email': 'cached@example.com', 'password': 'testpass'})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['token']['access']}")
+        invalidate_user(self.user.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/notifications/notifications/unread-count/')
+        self.assertEqual(response.data, {'unread': 0})
+        self.assertFalse([q for q in queries if 'FROM "users_user"' in q['sql']])
+
+
+class TokenBlacklistTest(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='holder', email='holder@example.com', password='testpass', role='client')
+        self.refresh = RefreshToken.for_user(self.user)
+        blacklist_index.rebuild()
+
+    def refresh_access(self):
+        return self.client.post('/api/token/refresh/', {'refresh': str(self.refresh)})
+
+    def test_refresh_skips_database_once_warm(self):
+        self.assertEqual(self.refresh_access().status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.refresh_access().status_code, 200)
+
+    def test_logout_revokes_refresh_token(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+        other_process = BlacklistIndex(rebuild_interval=3600)
+        other_process.rebuild()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/users/logout/', {'refresh': str(self.refresh)})
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.refresh_access().status_code, 401)
+        # Another process picks the revocation up through the version stamp.
+        self.assertTrue(other_process.contains(self.refresh['jti']))
+        fresh = RefreshToken.for_user(self.user)
+        with self.assertNumQueries(0):
+            self.assertFalse(other_process.contains(fresh['jti']))
+
+    def test_prune_tokens_removes_expired_rows(self):
+        expired = timezone.now() - timedelta(days=1)
+        stale = [OutstandingToken.objects.create(user=self.user, jti=f'old-{i}', token='', expires_at=expired)
+                 for i in range(5)]
+        BlacklistedToken.objects.create(token=stale[0])
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=self.refresh['jti']))
+
+        call_command('prune_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), [self.refresh['jti']])
+        self.assertEqual(BlacklistedToken.objects.count(), 1)
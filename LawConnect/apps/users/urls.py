@@ -9,6 +9,7 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
       path('clients/', ClientListView.as_view(), name='client-list'),
     path('lawyers/', LawyerListView.as_view(), name='lawyer-list'),
+    path('lawyers/search/', LawyerSearchView.as_view(), name='lawyer-search'),
     path("lawyers/<int:pk>/", LawyerDetailView.as_view(), name="lawyer-detail"),
     path("clients/<int:pk>/", ClientDetailView.as_view(), name="client-detail"),
 ]
\ No newline at end of file
@@ -1,5 +1,4 @@
 
-from rest_framework_simplejwt.tokens import RefreshToken
 
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
@@ -8,6 +7,20 @@ from django.contrib.auth import get_user_model
 from apps.cases.models import Case
 from apps.cases.serializers import CaseSerializer
 
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .authentication import add_user_claims, invalidate_user
+from .blacklist import IndexedRefreshToken
+from .cache import directory_cache_key
+from .search import search_lawyers
 from .permission import IsOwnerOrAdmin
 from apps.users.models import LawyerProfile
 
@@ -46,9 +59,7 @@ from django.contrib.auth import get_user_model
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     @classmethod
     def get_token(cls, user):
-        token = super().get_token(user)
-        # Optionally add extra claims here
-        return token
+        return add_user_claims(super().get_token(user), user)
 
     def validate(self, attrs):
         email = attrs.get('email')
@@ -90,9 +101,10 @@ class LogoutView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
+        invalidate_user(request.user.pk)
         try:
             refresh_token = request.data['refresh']
-            token = RefreshToken(refresh_token)
+            token = IndexedRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Successfully logged out"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception:
@@ -106,25 +118,97 @@ class ClientListView(APIView):
         clients = User.objects.filter(role='client')
         data = [{"id": u.id, "name": u.username, "email": u.email} for u in clients]
         return Response(data)
+def lawyer_directory_rows(queryset):
+    """Project lawyers onto their public user and profile columns in one joined query."""
+    return queryset.values(
+        'id', 'username', 'first_name', 'last_name', 'email', 'phone', 'avatar',
+        name=F('username'),
+        specialization=F('lawyer_profile__specialization'),
+        firm=F('lawyer_profile__firm'),
+        experience=F('lawyer_profile__experience'),
+        per_case_charge=F('lawyer_profile__per_case_charge'),
+        approved=F('lawyer_profile__approved'),
+    )
+
+
+class LawyerDirectoryPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_number_or_404(self, request, count, page_size):
+        """The requested page as an int, with ``last`` resolved against ``count``."""
+        num_pages = max(math.ceil(count / page_size), 1)
+        number = request.query_params.get(self.page_query_param, '1')
+        if number in self.last_page_strings:
+            return num_pages
+        if number.isdigit() and 0 < int(number) <= num_pages:
+            return int(number)
+        raise NotFound(self.invalid_page_message.format(page_number=number, message=_('Invalid page.')))
+
+    def get_page_link(self, request, number):
+        url = request.build_absolute_uri()
+        if number == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, number)
+
+
 class LawyerListView(APIView):
+    """Public lawyer directory.
+
+    Only the public user and profile columns are selected, in one joined
+    query. The total and each page of rows are cached under a version stamp
+    that the ``User``/``LawyerProfile`` signals bump whenever a lawyer
+    changes; the next/previous links are built for each request.
+    """
     permission_classes = [IsAuthenticated]
+    pagination_class = LawyerDirectoryPagination
 
     def get(self, request):
-        clients = User.objects.filter(role='lawyer')
-        print(clients)
-        data = list(clients.values())
-        print(data)
-        for client in data:
-            del client['password']
-            del   client["last_login"]
-            del client["date_joined"]
-            del client["is_superuser"]
-            del client["is_staff"]
-            
-            
-            
-        return Response(data)
+        paginator = self.pagination_class()
+        page_size = paginator.get_page_size(request)
+        lawyers = lawyer_directory_rows(User.objects.filter(role='lawyer')).order_by('username', 'id')
+
+        count_key = directory_cache_key('count')
+        count = cache.get(count_key)
+        if count is None:
+            count = lawyers.count()
+            cache.set(count_key, count, settings.LAWYER_DIRECTORY_CACHE_TIMEOUT)
+
+        number = paginator.get_page_number_or_404(request, count, page_size)
+        key = directory_cache_key(f'{number}:{page_size}')
+        rows = cache.get(key)
+        if rows is None:
+            start = (number - 1) * page_size
+            rows = list(lawyers[start:start + page_size])
+            cache.set(key, rows, settings.LAWYER_DIRECTORY_CACHE_TIMEOUT)
+
+        return Response({
+            'count': count,
+            'next': paginator.get_page_link(request, number + 1) if number * page_size < count else None,
+            'previous': paginator.get_page_link(request, number - 1) if number > 1 else None,
+            'results': rows,
+        })
+
+
+
+class LawyerSearchView(APIView):
+    """Ranked search over lawyer names, specializations, firms and bios.
+
+    ``?q=`` supports prefixes and small typos; ``?limit=`` caps the results
+    (default 20, at most 100).
+    """
+    permission_classes = [IsAuthenticated]
 
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        limit = request.query_params.get('limit', '20')
+        if not limit.isdigit() or not 0 < int(limit) <= 100:
+            return Response({"error": "limit must be between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
+
+        ids = search_lawyers(query, int(limit))
+        rows = {row['id']: row for row in lawyer_directory_rows(User.objects.filter(id__in=ids, role='lawyer'))}
+        return Response({"results": [rows[pk] for pk in ids if pk in rows]})
 
 
 class LawyerDetailView(APIView):
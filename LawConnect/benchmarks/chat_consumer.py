@@ -0,0 +1,178 @@
+"""Load and latency benchmark for ``ChatConsumer``.
+
+Drives pairs of simulated clients through the real consumer with
+``channels.testing.WebsocketCommunicator`` on an in-memory channel layer and a
+throwaway test database, then prints one JSON document::
+
+    python -m benchmarks.chat_consumer --clients 2000 --rounds 5 --output bench.json
+
+Each round, every client sends one message to its partner. Latency is
+measured from ``send`` to receipt at both members of the room group (the
+partner and the sender's own echo), so it covers the consumer, the channel
+layer fan-out and the write buffer hand-off. Memory per connection is the
+traced Python heap growth while the first ``memory_sample`` clients connect;
+the rest connect untraced so the connect rate is not skewed by tracing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'LawConnect.settings')
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def create_pairs(pairs):
+    """Create ``pairs`` client/lawyer rooms, each with its own case."""
+    from apps.cases.models import Case
+    from apps.users.models import User
+
+    # bulk_create skips the profile signals, which a benchmark does not need.
+    users = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com', role='lawyer' if i % 2 else 'client')
+        for i in range(pairs * 2)
+    ])
+    cases = Case.objects.bulk_create([
+        Case(title=f'Bench {i}', description='benchmark', type='civil', client=users[2 * i], lawyer=users[2 * i + 1])
+        for i in range(pairs)
+    ])
+    return [(users[2 * i], users[2 * i + 1], cases[i]) for i in range(pairs)]
+
+
+async def connect(application, user, peer, case):
+    from channels.testing import WebsocketCommunicator
+
+    communicator = WebsocketCommunicator(application, f'/ws/chat/{peer.id}/?case_id={case.id}')
+    communicator.scope['user'] = user
+    connected, _ = await communicator.connect(timeout=30)
+    if not connected:
+        raise RuntimeError(f"Client {user.username} was refused.")
+    return communicator
+
+
+async def run_benchmark(pairs, rounds=5, memory_sample=200, timeout=30):
+    """Run the benchmark against the configured database and channel layer."""
+    from channels.db import database_sync_to_async
+    from channels.routing import URLRouter
+    from django.urls import path
+
+    from apps.cases.models import Message
+    from LawConnect.consumers import ChatConsumer, message_buffer
+
+    application = URLRouter([path('ws/chat/<int:room_name>/', ChatConsumer.as_asgi())])
+    rooms = await database_sync_to_async(create_pairs)(pairs)
+
+    async def connect_rooms(selection):
+        connected = []
+        for user, peer, case in selection:
+            connected.append(await connect(application, user, peer, case))
+            connected.append(await connect(application, peer, user, case))
+        return connected
+
+    sampled_pairs = max(1, memory_sample // 2)
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    clients = await connect_rooms(rooms[:sampled_pairs])
+    grown = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(baseline, 'filename'))
+    memory_per_connection = grown / len(clients)
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    untraced = await connect_rooms(rooms[sampled_pairs:])
+    connect_seconds = time.perf_counter() - started
+    clients += untraced
+
+    latencies = []
+
+    async def receive(communicator, expected):
+        for _ in range(expected):
+            event = await communicator.receive_json_from(timeout=timeout)
+            latencies.append(time.perf_counter() - float(event['message']))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for communicator in clients:
+            await communicator.send_json_to({'message': repr(time.perf_counter())})
+        # Every client gets its partner's message and its own echo.
+        await asyncio.gather(*(receive(communicator, 2) for communicator in clients))
+    elapsed = time.perf_counter() - started
+
+    for communicator in clients:
+        await communicator.disconnect()
+    await message_buffer.flush()
+    persisted = await database_sync_to_async(Message.objects.count)()
+
+    latencies.sort()
+    sent = len(clients) * rounds
+    return {
+        'clients': len(clients),
+        'rounds': rounds,
+        'messages_sent': sent,
+        'deliveries': len(latencies),
+        'messages_persisted': persisted,
+        'connections_per_second': round(len(untraced) / connect_seconds, 1) if untraced else None,
+        'elapsed_seconds': round(elapsed, 4),
+        'messages_per_second': round(sent / elapsed, 1) if elapsed else None,
+        'deliveries_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'memory_per_connection_bytes': round(memory_per_connection),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--clients', type=int, default=1000, help="Simulated clients (rounded up to an even number).")
+    parser.add_argument('--rounds', type=int, default=5, help="Messages sent by every client.")
+    parser.add_argument('--memory-sample', type=int, default=200, help="Clients connected under tracemalloc.")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    settings.CHANNEL_LAYERS = {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer', 'CONFIG': {'capacity': 1000}}}
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        result = asyncio.run(run_benchmark((args.clients + 1) // 2, args.rounds, args.memory_sample))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    import channels
+    result['environment'] = {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'channels': channels.__version__,
+        'database': connection.vendor,
+        'channel_layer': settings.CHANNEL_LAYERS['default']['BACKEND'],
+    }
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as fh:
+            fh.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()